@@ -1,7 +1,8 @@
-from .wbi import encWbi, getWbiKeys
-import requests
+from .wbi import keys
+from . import client, metrics
+import asyncio
 
-def getSingleVideoInfo(avid: int = 0, bv: str = '') -> dict:
+async def getSingleVideoInfo(avid: int = 0, bv: str = '') -> dict:
     '获取单个视频的信息'
     if avid == 0 and bv == '':
         return {'status': 'error', 'message': 'avid 和 bv 至少需要一个'}
@@ -13,23 +14,23 @@ def getSingleVideoInfo(avid: int = 0, bv: str = '') -> dict:
         params = {
             'bvid': bv
         }
-    img_key, sub_key = getWbiKeys()
-    signed_params = encWbi(params, img_key, sub_key)
-    
-    headers = {
-        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/131.0.0.0 Safari/537.36",
-        "Referer": "https://www.bilibili.com/",
-    }
-    
-    response = requests.get(
-        "https://api.bilibili.com/x/web-interface/wbi/view/detail",
+    signed_params = await keys.sign(dict(params))
+    seen = keys.fetched_at
+    video_info = await client.get_json(
+        "/x/web-interface/wbi/view/detail",
         params=signed_params,
-        headers=headers,
     )
-
-    video_info = response.json()
+    if video_info["code"] == -352:
+        # 签名校验失败, key 可能已轮换: 刷新后重试一次
+        await keys.refresh(seen)
+        video_info = await client.get_json(
+            "/x/web-interface/wbi/view/detail",
+            params=await keys.sign(dict(params)),
+        )
 
     if video_info["code"] != 0:
+        # B 站的业务错误 (-404, -352 等) 以 HTTP 200 返回, 单独计数
+        metrics.UPSTREAM_ERRORS.inc(path="/x/web-interface/wbi/view/detail", error=f'code {video_info["code"]}')
         return {'status': 'error', 'message': video_info}
     
     if "View" not in video_info["data"]:
@@ -48,3 +49,11 @@ def getSingleVideoInfo(avid: int = 0, bv: str = '') -> dict:
     }
     
     return video_data
+
+
+async def getMultipleVideoInfo(ids: list[tuple[int, str]]) -> list:
+    '并发获取多个视频的信息, 并发度和速率由 client 限制; 失败项返回异常对象'
+    return await asyncio.gather(
+        *[getSingleVideoInfo(avid, bv) for avid, bv in ids],
+        return_exceptions=True,
+    )
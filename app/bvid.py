@@ -0,0 +1,43 @@
+XOR_CODE = 23442827791579
+MASK_CODE = 2251799813685247
+MAX_AID = 1 << 51
+ALPHABET = 'FcwAPNKTMug3GV5Lj7EJnHpWsx4tb8haYeviqBz6rkCy12mUSDQX9RdoZf'
+ENCODE_MAP = (8, 7, 0, 5, 1, 3, 2, 4, 6)
+DECODE_MAP = tuple(reversed(ENCODE_MAP))
+BASE = len(ALPHABET)
+PREFIX = 'BV1'
+BVID_LENGTH = len(PREFIX) + len(ENCODE_MAP)
+_INDEX = {c: i for i, c in enumerate(ALPHABET)}
+
+def av2bv(aid: int) -> str:
+    'avid 转 bvid, 纯本地计算'
+    if not 0 < aid < MAX_AID:
+        raise ValueError(f'aid 超出范围: {aid}')
+    bvid = [''] * len(ENCODE_MAP)
+    tmp = (MAX_AID | aid) ^ XOR_CODE
+    for i in range(len(ENCODE_MAP)):
+        bvid[ENCODE_MAP[i]] = ALPHABET[tmp % BASE]
+        tmp //= BASE
+    return PREFIX + ''.join(bvid)
+
+def bv2av(bvid: str) -> int:
+    'bvid 转 avid, 纯本地计算'
+    if len(bvid) != BVID_LENGTH or bvid[:3].upper() != PREFIX.upper():
+        raise ValueError(f'不是合法的 bvid: {bvid}')
+    code = bvid[3:]
+    tmp = 0
+    for i in range(len(DECODE_MAP)):
+        index = _INDEX.get(code[DECODE_MAP[i]])
+        if index is None:
+            raise ValueError(f'不是合法的 bvid: {bvid}')
+        tmp = tmp * BASE + index
+    return (tmp & MASK_CODE) ^ XOR_CODE
+
+def normalizeAid(avid: int = 0, bv: str = '') -> int:
+    '把 avid/bvid 统一成 avid, 无法转换时返回 0'
+    if avid:
+        return avid
+    try:
+        return bv2av(bv)
+    except ValueError:
+        return 0
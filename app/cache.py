@@ -0,0 +1,102 @@
+from collections import OrderedDict
+from dotenv import load_dotenv
+from typing import Any, Awaitable, Callable, Dict, Hashable, Iterable
+import time
+import os
+
+from . import shared
+
+load_dotenv()
+
+PRIORITY_CACHE_TTL = float(os.getenv("PRIORITY_CACHE_TTL", "60"))
+PRIORITY_CACHE_SIZE = int(os.getenv("PRIORITY_CACHE_SIZE", "64"))
+DIM_CACHE_TTL = float(os.getenv("DIM_CACHE_TTL", "600"))
+DIM_CACHE_SIZE = int(os.getenv("DIM_CACHE_SIZE", "10000"))
+
+_MISSING = object()
+
+
+class TTLCache:
+    """In-process LRU cache whose entries also expire after `ttl` seconds."""
+
+    def __init__(self, maxsize: int = 128, ttl: float = 60):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data: OrderedDict = OrderedDict()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        entry = self._data.get(key, _MISSING)
+        if entry is not _MISSING and entry[0] > time.monotonic():
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+        if entry is not _MISSING:
+            del self._data[key]
+        self.misses += 1
+        return default
+
+    def set(self, key: Hashable, value: Any):
+        self._data[key] = (time.monotonic() + self.ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def delete(self, key: Hashable):
+        self._data.pop(key, None)
+
+    def clear(self):
+        self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+# Serialized /get_video_static_by_priority pages, cleared in every worker on
+# each video_static write (shared.invalidate("priority"))
+priority_cache = TTLCache(PRIORITY_CACHE_SIZE, PRIORITY_CACHE_TTL)
+shared.register_cache("priority", priority_cache)
+
+
+async def get_many(
+    cache: TTLCache,
+    keys: Iterable[Hashable],
+    fetch: Callable[[list], Awaitable[Dict[Hashable, Any]]],
+) -> dict:
+    """Serve keys from `cache` and load all misses with one `fetch` call.
+
+    Keys that `fetch` does not return are cached as None, so unknown ids do
+    not hit the database again until the entry expires.
+    """
+    found = {}
+    missing = []
+    for key in dict.fromkeys(keys):
+        value = cache.get(key, _MISSING)
+        if value is _MISSING:
+            missing.append(key)
+        else:
+            found[key] = value
+    if missing:
+        fetched = await fetch(missing)
+        for key in missing:
+            value = fetched.get(key)
+            cache.set(key, value)
+            found[key] = value
+    return found
+
+
+# Small, rarely changing lookup tables
+user_cache = TTLCache(DIM_CACHE_SIZE, DIM_CACHE_TTL)
+type_cache = TTLCache(DIM_CACHE_SIZE, DIM_CACHE_TTL)
+identifier_cache = TTLCache(DIM_CACHE_SIZE, DIM_CACHE_TTL)
+vocal_cache = TTLCache(DIM_CACHE_SIZE, DIM_CACHE_TTL)
@@ -0,0 +1,103 @@
+from dotenv import load_dotenv
+from typing import Optional
+import asyncio
+import httpx
+import time
+import os
+
+from . import metrics, shared
+
+load_dotenv()
+
+BILIBILI_API_BASE = os.getenv("BILIBILI_API_BASE", "https://api.bilibili.com")
+BILIBILI_TIMEOUT = float(os.getenv("BILIBILI_TIMEOUT", "10"))
+BILIBILI_CONNECT_TIMEOUT = float(os.getenv("BILIBILI_CONNECT_TIMEOUT", "3"))
+BILIBILI_MAX_CONNECTIONS = int(os.getenv("BILIBILI_MAX_CONNECTIONS", "20"))
+BILIBILI_CONCURRENCY = int(os.getenv("BILIBILI_CONCURRENCY", "8"))
+BILIBILI_RATE = float(os.getenv("BILIBILI_RATE", "10"))  # requests per second, 0 disables
+BILIBILI_BURST = int(os.getenv("BILIBILI_BURST", "10"))
+
+HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/131.0.0.0 Safari/537.36",
+    "Referer": "https://www.bilibili.com/",
+}
+
+
+class RateLimiter:
+    """Token bucket that paces upstream requests of this process."""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = max(burst, 1)
+        self.tokens = float(self.burst)
+        self.updated = time.monotonic()
+        self.waited = 0.0
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        if self.rate <= 0:
+            return
+        # Waiters queue on the lock, so tokens are handed out in FIFO order
+        async with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens < 1:
+                delay = (1 - self.tokens) / self.rate
+                self.waited += delay
+                await asyncio.sleep(delay)
+                self.tokens = 1.0
+                self.updated = time.monotonic()
+            self.tokens -= 1
+
+
+_client: Optional[httpx.AsyncClient] = None
+# Caps in-flight upstream requests across all routes of this process
+_semaphore = asyncio.Semaphore(BILIBILI_CONCURRENCY)
+limiter = RateLimiter(BILIBILI_RATE, BILIBILI_BURST)
+if shared.store.scheme != "memory":
+    # One budget for all workers; the local bucket stays as the fallback
+    limiter = shared.SharedRateLimiter("bilibili", BILIBILI_RATE, BILIBILI_BURST, fallback=limiter)
+
+
+def get_client() -> httpx.AsyncClient:
+    """Return the shared keep-alive client, creating it on first use."""
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(
+            base_url=BILIBILI_API_BASE,
+            headers=HEADERS,
+            timeout=httpx.Timeout(BILIBILI_TIMEOUT, connect=BILIBILI_CONNECT_TIMEOUT),
+            limits=httpx.Limits(
+                max_connections=BILIBILI_MAX_CONNECTIONS,
+                max_keepalive_connections=BILIBILI_MAX_CONNECTIONS,
+                keepalive_expiry=60,
+            ),
+        )
+    return _client
+
+
+async def get_json(path: str, params: Optional[dict] = None) -> dict:
+    """GET a Bilibili API path and return the decoded JSON body."""
+    await limiter.acquire()
+    async with _semaphore:
+        start = time.perf_counter()
+        try:
+            response = await get_client().get(path, params=params)
+        except httpx.HTTPError as e:
+            metrics.UPSTREAM_ERRORS.inc(path=path, error=type(e).__name__)
+            metrics.observe_upstream(path, "error", time.perf_counter() - start)
+            raise
+    metrics.observe_upstream(path, str(response.status_code), time.perf_counter() - start)
+    if response.is_error:
+        metrics.UPSTREAM_ERRORS.inc(path=path, error=f"HTTP {response.status_code}")
+    response.raise_for_status()
+    return response.json()
+
+
+async def close():
+    """Close the shared client and its pooled connections."""
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
@@ -0,0 +1,81 @@
+from datetime import datetime, timezone
+from typing import Dict, List, Tuple
+import numpy as np
+
+# Content type of columnar bodies: {"time": [...], "aid": [...], "view": [...], ...}
+COLUMNAR_MEDIA_TYPE = "application/x-columnar+json"
+
+INT32_MAX = 2**31 - 1
+INT64_MAX = 2**63 - 1
+
+# Column -> inclusive (min, max); every column is an integer array
+MINUTE_COLUMNS: Dict[str, Tuple[int, int]] = {
+    "time": (0, 2**32 - 1),  # unix seconds
+    "aid": (1, INT64_MAX),
+    "coin": (0, INT32_MAX),
+    "favorite": (0, INT32_MAX),
+    "danmaku": (0, INT32_MAX),
+    "view": (0, INT32_MAX),
+    "reply": (0, INT32_MAX),
+    "share": (0, INT32_MAX),
+    "like": (0, INT32_MAX),
+}
+
+
+class ColumnarError(ValueError):
+    """Invalid columnar body; `errors` follows FastAPI's validation error format."""
+
+    def __init__(self, errors: List[dict]):
+        super().__init__(errors[0]["msg"])
+        self.errors = errors
+
+
+def error(loc: tuple, msg: str) -> dict:
+    return {"type": "value_error", "loc": ("body",) + loc, "msg": msg, "input": None}
+
+
+def parse_columns(body, columns: Dict[str, Tuple[int, int]]) -> Dict[str, np.ndarray]:
+    """Validate a columnar body into int64 arrays, one whole column at a time.
+
+    Each column must be a flat list of integers (no floats, bools or nulls)
+    within its range, and all columns must have the same length.
+    """
+    if not isinstance(body, dict):
+        raise ColumnarError([error((), "Expected an object of column arrays")])
+    errors = [error((name,), "Field required") for name in columns if name not in body]
+    errors += [error((name,), "Unknown column") for name in body if name not in columns]
+    if errors:
+        raise ColumnarError(errors)
+
+    arrays = {}
+    for name, (low, high) in columns.items():
+        values = body[name]
+        try:
+            array = np.array(values) if isinstance(values, list) else None
+        except ValueError:  # ragged nested lists
+            array = None
+        if array is None or array.ndim != 1 or (array.size and array.dtype.kind not in "iu"):
+            errors.append(error((name,), "Expected a flat array of integers"))
+            continue
+        out_of_range = np.flatnonzero((array < low) | (array > high))
+        if out_of_range.size:
+            first = int(out_of_range[0])
+            errors.append(error(
+                (name, first),
+                f"{out_of_range.size} value(s) outside [{low}, {high}], first: {values[first]}",
+            ))
+            continue
+        arrays[name] = array.astype(np.int64)
+    if errors:
+        raise ColumnarError(errors)
+
+    lengths = {len(array) for array in arrays.values()}
+    if len(lengths) > 1:
+        raise ColumnarError([error((), f"Columns have different lengths: {sorted(lengths)}")])
+    return arrays
+
+
+def minute_records(arrays: Dict[str, np.ndarray]) -> List[tuple]:
+    """Zip validated minute columns into COPY tuples in MINUTE_COLUMNS order."""
+    times = [datetime.fromtimestamp(t, tz=timezone.utc) for t in arrays["time"].tolist()]
+    return list(zip(times, *[arrays[name].tolist() for name in MINUTE_COLUMNS if name != "time"]))
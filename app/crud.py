@@ -1,7 +1,11 @@
-from sqlalchemy import select
-from datetime import date
-from . import models, schemas
-from typing import List, Union
+from sqlalchemy import select, func, tuple_, literal_column, union_all, Boolean, Integer
+from sqlalchemy.dialects.postgresql import insert, aggregate_order_by, ARRAY
+from datetime import date, datetime, timedelta, timezone
+from . import models, schemas, ingest, shared
+from .metrics import instrument_db
+from .leaderboard import leaderboard, LEADERBOARD_ENABLED
+from .partitions import minute_partitions
+from typing import AsyncIterator, List, Optional
 from .database import SessionLocal
 from sqlalchemy.exc import IntegrityError
 import logging
@@ -10,6 +14,7 @@ logger = logging.getLogger(__name__)
 
 
 # Get by aid
+@instrument_db
 async def get_video_static(aid: int) -> models.VideoStatic:
     """Get static information for a video by AV ID."""
     async with SessionLocal() as db:
@@ -18,6 +23,7 @@ async def get_video_static(aid: int) -> models.VideoStatic:
         return result.scalar_one_or_none()
 
 
+@instrument_db
 async def get_video_static_bulk(aids: List[int]) -> List[models.VideoStatic]:
     """Get static information for multiple videos by their AV IDs."""
     if not aids:
@@ -29,21 +35,66 @@ async def get_video_static_bulk(aids: List[int]) -> List[models.VideoStatic]:
 
 
 # get video static by priority
-async def get_video_static_by_priority(priority: int = 0) -> List[models.VideoStatic]:
-    """Get static information for a video by AV ID and priority."""
+def video_static_by_priority_query(
+    priority: int = 0,
+    after_aid: int = 0,
+    limit: Optional[int] = None,
+    columns: Optional[List[str]] = None,
+):
+    """Build the priority work-list query, keyset-paginated on aid."""
+    if columns:
+        query = select(*[models.VideoStatic.__table__.c[column] for column in columns])
+    else:
+        query = select(models.VideoStatic)
+    if priority == 0:
+        query = query.where(models.VideoStatic.priority.isnot(None))
+    else:
+        query = query.where(models.VideoStatic.priority == priority)
+    if after_aid:
+        query = query.where(models.VideoStatic.aid > after_aid)
+    query = query.order_by(models.VideoStatic.aid)
+    if limit:
+        query = query.limit(limit)
+    return query
+
+
+@instrument_db
+async def get_video_static_by_priority(
+    priority: int = 0,
+    after_aid: int = 0,
+    limit: Optional[int] = None,
+    columns: Optional[List[str]] = None,
+):
+    """Get static information for videos by priority.
+
+    Returns ORM rows, or plain dicts when `columns` projects a subset.
+    """
     async with SessionLocal() as db:
-        if priority == 0:
-            query = select(models.VideoStatic).where(
-                models.VideoStatic.priority.isnot(None)
-            )
-        else:
-            query = select(models.VideoStatic).where(
-                models.VideoStatic.priority == priority
-            )
+        query = video_static_by_priority_query(priority, after_aid, limit, columns)
         result = await db.execute(query)
+        if columns:
+            return [dict(row) for row in result.mappings()]
         return result.scalars().all()
 
 
+async def stream_video_static_by_priority(
+    priority: int = 0,
+    after_aid: int = 0,
+    columns: Optional[List[str]] = None,
+    batch_size: int = 1000,
+) -> AsyncIterator[dict]:
+    """Yield video static rows as dicts from a server-side cursor."""
+    if not columns:
+        columns = [column.name for column in models.VideoStatic.__table__.columns]
+    async with SessionLocal() as db:
+        query = video_static_by_priority_query(priority, after_aid, None, columns)
+        result = await db.stream(query)
+        async for rows in result.mappings().partitions(batch_size):
+            for row in rows:
+                yield dict(row)
+
+
+@instrument_db
 async def get_video_dynamic(
     aid: int, record_date: date = date.today(), record_time: int = 0
 ):
@@ -59,6 +110,7 @@ async def get_video_dynamic(
         return result.scalar_one_or_none()
 
 
+@instrument_db
 async def get_video_minute(aid: int, time: int):
     """Get minute-level statistics for a video."""
     async with SessionLocal() as db:
@@ -66,13 +118,111 @@ async def get_video_minute(aid: int, time: int):
             query = select(models.VideoMinute).where(
                 models.VideoMinute.aid == aid, models.VideoMinute.time == time
             )
-        else:
-            query = select(models.VideoMinute).where(models.VideoMinute.aid == aid)
+            result = await db.execute(query)
+            return result.scalar()
+        # Latest row, read from the head of ix_video_minute_aid_time. Look in
+        # the newest partitions first; older ones only if the aid has no
+        # recent data
+        query = (
+            select(models.VideoMinute)
+            .where(models.VideoMinute.aid == aid)
+            .order_by(models.VideoMinute.time.desc())
+            .limit(1)
+        )
+        recent = datetime.now(timezone.utc) - timedelta(seconds=minute_partitions.interval)
+        row = (await db.execute(query.where(models.VideoMinute.time >= recent))).scalar()
+        if row is None:
+            row = (await db.execute(query)).scalar()
+        return row
+
+
+# Bucket boundaries follow the server's local day (TZ=Asia/Shanghai in Docker)
+BUCKET_UTC_OFFSET = int(datetime.now().astimezone().utcoffset().total_seconds())
+
+
+@instrument_db
+async def get_video_minute_series(
+    aids: List[int],
+    start: datetime,
+    end: datetime,
+    bucket_seconds: int,
+    agg: str = "last",
+    metrics: Optional[List[str]] = None,
+) -> dict:
+    """Downsample minute statistics into fixed buckets, computed in SQL.
+
+    `agg` is one of:
+    - "last": the latest value in each bucket
+    - "max": the largest value in each bucket
+    - "delta": the last value minus the previous bucket's last value
+
+    Returns {aid: {"time": [bucket start epoch], metric: [values]}}.
+    """
+    metrics = metrics or schemas.MINUTE_METRICS
+    # Deltas also need the bucket just before `start` as their baseline
+    since = start - timedelta(seconds=bucket_seconds) if agg == "delta" else start
+    minute = models.VideoMinute.__table__
+    await minute_partitions.refresh()
+    raw_since = minute_partitions.raw_since()
+    if raw_since is not None and since < raw_since:
+        # The range reaches into compacted history: hourly rows before the
+        # boundary, minute rows after it (late rows before it are not compacted yet)
+        hourly = models.VideoMinuteHourly.__table__
+        columns = ["time", "aid", *metrics]
+        minute = union_all(
+            select(*[minute.c[column] for column in columns]).where(minute.c.time >= raw_since),
+            select(*[hourly.c[column] for column in columns]).where(hourly.c.time < raw_since),
+        ).subquery()
+    epoch = func.extract("epoch", minute.c.time) + BUCKET_UTC_OFFSET
+    bucket = (func.floor(epoch / bucket_seconds) * bucket_seconds - BUCKET_UTC_OFFSET).label("bucket")
+    if agg == "max":
+        values = [func.max(minute.c[metric]).label(metric) for metric in metrics]
+    else:
+        values = [
+            func.array_agg(aggregate_order_by(minute.c[metric], minute.c.time.desc()), type_=ARRAY(Integer))[1].label(metric)
+            for metric in metrics
+        ]
+    query = (
+        select(minute.c.aid, bucket, *values)
+        .where(minute.c.aid.in_(aids), minute.c.time >= since, minute.c.time < end)
+        .group_by(minute.c.aid, literal_column("bucket"))
+    )
+    if agg == "delta":
+        buckets = query.subquery()
+        deltas = select(
+            buckets.c.aid,
+            buckets.c.bucket,
+            *[
+                (
+                    buckets.c[metric]
+                    - func.lag(buckets.c[metric]).over(partition_by=buckets.c.aid, order_by=buckets.c.bucket)
+                ).label(metric)
+                for metric in metrics
+            ],
+        ).subquery()
+        query = (
+            select(deltas)
+            .where(deltas.c.bucket > start.timestamp() - bucket_seconds)
+            .order_by(deltas.c.aid, deltas.c.bucket)
+        )
+    else:
+        query = query.order_by(minute.c.aid, literal_column("bucket"))
+
+    series = {}
+    async with SessionLocal() as db:
         result = await db.execute(query)
-        return result.scalar()
+        for row in result:
+            columns = series.get(row.aid)
+            if columns is None:
+                columns = series[row.aid] = {"time": [], **{metric: [] for metric in metrics}}
+            columns["time"].append(int(row.bucket))
+            for metric in metrics:
+                columns[metric].append(getattr(row, metric))
+    return series
 
 
 # Get by other fields
+@instrument_db
 async def get_user(user_id: int):
     """Get user information by user ID."""
     async with SessionLocal() as db:
@@ -81,6 +231,7 @@ async def get_user(user_id: int):
         return result.scalar_one_or_none()
 
 
+@instrument_db
 async def get_type(type_id: int):
     """Get type information by type ID."""
     async with SessionLocal() as db:
@@ -89,6 +240,7 @@ async def get_type(type_id: int):
         return result.scalar_one_or_none()
 
 
+@instrument_db
 async def get_identifier_map(identifier: str):
     """Get identifier mapping by identifier string."""
     async with SessionLocal() as db:
@@ -99,6 +251,7 @@ async def get_identifier_map(identifier: str):
         return result.scalar_one_or_none()
 
 
+@instrument_db
 async def get_video_vocals(aid: int):
     """Get all vocals associated with a video."""
     async with SessionLocal() as db:
@@ -109,6 +262,88 @@ async def get_video_vocals(aid: int):
         return result.scalars().all()
 
 
+@instrument_db
+async def get_users(user_ids: List[int]) -> dict:
+    """Get users by ID, as {user_id: DimUser}."""
+    if not user_ids:
+        return {}
+    async with SessionLocal() as db:
+        query = select(models.DimUser).where(models.DimUser.user_id.in_(user_ids))
+        result = await db.execute(query)
+        return {user.user_id: schemas.DimUser.model_validate(user) for user in result.scalars()}
+
+
+@instrument_db
+async def get_types(type_ids: List[int]) -> dict:
+    """Get types by ID, as {type_id: DimType}."""
+    if not type_ids:
+        return {}
+    async with SessionLocal() as db:
+        query = select(models.DimType).where(models.DimType.type_id.in_(type_ids))
+        result = await db.execute(query)
+        return {type_.type_id: schemas.DimType.model_validate(type_) for type_ in result.scalars()}
+
+
+@instrument_db
+async def get_identifier_maps(identifiers: List[str]) -> dict:
+    """Get identifier mappings, as {identifier: IdentifierMap}."""
+    if not identifiers:
+        return {}
+    async with SessionLocal() as db:
+        query = select(models.IdentifierMap).where(
+            models.IdentifierMap.identifier.in_(identifiers)
+        )
+        result = await db.execute(query)
+        return {row.identifier: schemas.IdentifierMap.model_validate(row) for row in result.scalars()}
+
+
+@instrument_db
+async def get_video_vocals_bulk(aids: List[int]) -> dict:
+    """Get vocal IDs of many videos, as {aid: [vocal_id, ...]}."""
+    vocals = {aid: [] for aid in aids}
+    if not aids:
+        return vocals
+    async with SessionLocal() as db:
+        query = select(models.OlapRelVideoVocal).where(
+            models.OlapRelVideoVocal.aid.in_(aids)
+        )
+        result = await db.execute(query)
+        for row in result.scalars():
+            vocals[row.aid].append(row.vocal_id)
+    return vocals
+
+
+@instrument_db
+async def get_video_details(aids: List[int]) -> dict:
+    """Get static info joined with user, type and vocals in one query, as {aid: VideoDetail}."""
+    if not aids:
+        return {}
+    static = models.VideoStatic
+    vocal_ids = (
+        select(func.array_agg(models.OlapRelVideoVocal.vocal_id))
+        .where(models.OlapRelVideoVocal.aid == static.aid)
+        .scalar_subquery()
+    )
+    query = (
+        select(
+            *static.__table__.columns,
+            models.DimUser.name.label("user_name"),
+            models.DimUser.face.label("user_face"),
+            models.DimType.name.label("type_name"),
+            vocal_ids.label("vocal_ids"),
+        )
+        .outerjoin(models.DimUser, models.DimUser.user_id == static.user_id)
+        .outerjoin(models.DimType, models.DimType.type_id == static.type_id)
+        .where(static.aid.in_(aids))
+    )
+    async with SessionLocal() as db:
+        result = await db.execute(query)
+        return {
+            row["aid"]: schemas.VideoDetail(**{**row, "vocal_ids": row["vocal_ids"] or []})
+            for row in result.mappings()
+        }
+
+
 # Add
 
 
@@ -156,42 +391,200 @@ async def add_records(
             logger.error(f"Database error in add_records: {str(e)}")
             raise e
 
+
+
+async def upsert_records(
+    model_cls,
+    data_list,
+    policy: schemas.ConflictPolicy = schemas.ConflictPolicy.ignore,
+    touch: Optional[str] = None,
+) -> schemas.UpsertResult:
+    """INSERT ... ON CONFLICT rows one statement per chunk, reporting per-key outcome.
+
+    With `ignore`, rows whose primary key already exists are skipped. With
+    `update`, they overwrite the stored row, but only when a value actually
+    differs; identical rows are reported as skipped. A key repeated inside the
+    batch is written once (first occurrence for `ignore`, last for `update`).
+    The `touch` column is left out of that comparison and set to now() on
+    every insert or actual update, unless the row provides it.
+    """
+    table = model_cls.__table__
+    key_columns = [column.name for column in table.primary_key.columns]
+    value_columns = [column.name for column in table.columns if column.name not in key_columns]
+    compared = [column for column in value_columns if column != touch]
+    now = datetime.now(timezone.utc)
+
+    rows = {}
+    for item in data_list:
+        row = item.model_dump()
+        if touch is not None and row[touch] is None:
+            row[touch] = now
+        key = tuple(row[column] for column in key_columns)
+        if policy == schemas.ConflictPolicy.update or key not in rows:
+            rows[key] = row
+    keys = list(rows)
+    if not keys:
+        return schemas.UpsertResult(inserted=[], updated=[], skipped=[])
+
+    inserted, updated = set(), set()
+    # RETURNING cannot read xmax from a partitioned table (video_minute)
+    partitioned = bool(table.dialect_options["postgresql"].get("partition_by"))
+    chunk_size = ingest.MAX_BIND_PARAMS // len(table.columns)
+    async with SessionLocal() as db:
+        try:
+            for start in range(0, len(keys), chunk_size):
+                chunk = [rows[key] for key in keys[start : start + chunk_size]]
+                existing = set()
+                if partitioned and policy == schemas.ConflictPolicy.update:
+                    # Lock the stored rows first and tell updates from inserts by key;
+                    # a row another request inserts meanwhile is reported as inserted
+                    key_tuple = tuple_(*[table.c[column] for column in key_columns])
+                    found = await db.execute(
+                        select(*[table.c[column] for column in key_columns])
+                        .where(key_tuple.in_(keys[start : start + chunk_size]))
+                        .with_for_update()
+                    )
+                    existing = {tuple(row) for row in found}
+                stmt = insert(table).values(chunk)
+                if policy == schemas.ConflictPolicy.update:
+                    stmt = stmt.on_conflict_do_update(
+                        index_elements=key_columns,
+                        set_={column: stmt.excluded[column] for column in value_columns},
+                        where=tuple_(*[table.c[column] for column in compared]).is_distinct_from(
+                            tuple_(*[stmt.excluded[column] for column in compared])
+                        ),
+                    )
+                else:
+                    stmt = stmt.on_conflict_do_nothing(index_elements=key_columns)
+                # xmax is 0 for freshly inserted tuples and non-zero for updated ones
+                is_insert = literal_column("true" if partitioned else "xmax = 0", Boolean).label("is_insert")
+                stmt = stmt.returning(*[table.c[column] for column in key_columns], is_insert)
+                result = await db.execute(stmt)
+                for row in result:
+                    key = tuple(row[: len(key_columns)])
+                    (inserted if row.is_insert and key not in existing else updated).add(key)
+            await db.commit()
+        except Exception as e:
+            await db.rollback()
+            logger.error(f"Database error in upsert_records: {str(e)}")
+            raise e
+
+    def as_dicts(selected):
+        return [dict(zip(key_columns, key)) for key in selected]
+
+    return schemas.UpsertResult(
+        inserted=as_dicts(key for key in keys if key in inserted),
+        updated=as_dicts(key for key in keys if key in updated),
+        skipped=as_dicts(key for key in keys if key not in inserted and key not in updated),
+    )
+
+
+def stamp(videos: List[schemas.VideoStaticCreate]) -> List[schemas.VideoStaticCreate]:
+    """Set updated_at to now where the caller left it empty."""
+    now = datetime.now(timezone.utc)
+    return [video if video.updated_at else video.model_copy(update={"updated_at": now}) for video in videos]
+
+
+@instrument_db
 async def add_video_static(video: schemas.VideoStaticCreate):
     """Add new video static information."""
-    db_instance = await add_record(models.VideoStatic, video)
+    db_instance = await add_record(models.VideoStatic, stamp([video])[0])
+    await shared.invalidate("priority")
     return schemas.VideoStatic.model_validate(db_instance)
 
-async def add_video_static_bulk(
-    videos: List[schemas.VideoStaticCreate],
-):
-    """Add new video static information in bulk."""
-    db_instances = await add_records(models.VideoStatic, videos)
-    return [schemas.VideoStatic.model_validate(instance) for instance in db_instances]
-
-
+@instrument_db
 async def add_video_dynamic(dynamic: schemas.VideoDynamicCreate):
     """Add new video dynamic information."""
     db_instance =  await add_record(models.VideoDynamic, dynamic)
     return schemas.VideoDynamic.model_validate(db_instance)
 
 
+@instrument_db
 async def add_video_dynamic_bulk(
     dynamics: List[schemas.VideoDynamicCreate],
 ):
-    """Add new video dynamic information in bulk."""
-    db_instances = await add_records(models.VideoDynamic, dynamics)
-    return [schemas.VideoDynamic.model_validate(instance) for instance in db_instances]
+    """Add new video dynamic information in bulk, skipping existing rows."""
+    return await ingest.copy_models(models.VideoDynamic, dynamics)
+
+
+@instrument_db
+async def add_video_dynamic_records(records: List[tuple]) -> schemas.BulkIngestResult:
+    """COPY pre-validated video dynamic tuples, in VideoDynamicCreate field order, skipping existing rows."""
+    return await ingest.copy_records(models.VideoDynamic, records, list(schemas.VideoDynamicCreate.model_fields))
 
 
+@instrument_db
 async def add_video_minute(minute: schemas.VideoMinuteCreate):
     """Add new video minute statistics."""
+    await minute_partitions.ensure([minute.time])
     db_instance = await add_record(models.VideoMinute, minute)
+    if LEADERBOARD_ENABLED:
+        leaderboard.observe_models([minute])
     return schemas.VideoMinute.model_validate(db_instance)
 
 
+@instrument_db
 async def add_video_minute_bulk(
     minutes: List[schemas.VideoMinuteCreate],
 ):
-    """Add new video minute statistics in bulk."""
-    db_instances = await add_records(models.VideoMinute, minutes)
-    return [schemas.VideoMinute.model_validate(instance) for instance in db_instances]
\ No newline at end of file
+    """Add new video minute statistics in bulk, skipping existing rows."""
+    await minute_partitions.ensure(minute.time for minute in minutes)
+    result = await ingest.copy_models(models.VideoMinute, minutes)
+    if LEADERBOARD_ENABLED:
+        leaderboard.observe_models(minutes)
+    return result
+
+
+@instrument_db
+async def add_video_minute_records(records: List[tuple]) -> schemas.BulkIngestResult:
+    """COPY pre-validated video minute tuples, in VideoMinuteCreate field order, skipping existing rows."""
+    await minute_partitions.ensure(record[0] for record in records)
+    result = await ingest.copy_records(models.VideoMinute, records, list(schemas.VideoMinuteCreate.model_fields))
+    if LEADERBOARD_ENABLED:
+        leaderboard.observe(records)
+    return result
+
+
+@instrument_db
+async def upsert_video_static_bulk(
+    videos: List[schemas.VideoStaticCreate],
+    policy: schemas.ConflictPolicy = schemas.ConflictPolicy.ignore,
+):
+    """Insert or update video static information in bulk."""
+    result = await upsert_records(models.VideoStatic, videos, policy, touch="updated_at")
+    if result.inserted or result.updated:
+        await shared.invalidate("priority")
+    return result
+
+
+@instrument_db
+async def upsert_video_dynamic_bulk(
+    dynamics: List[schemas.VideoDynamicCreate],
+    policy: schemas.ConflictPolicy = schemas.ConflictPolicy.ignore,
+):
+    """Insert or update video dynamic information in bulk."""
+    return await upsert_records(models.VideoDynamic, dynamics, policy)
+
+
+@instrument_db
+async def upsert_video_dynamic_records(
+    records: List[tuple],
+    policy: schemas.ConflictPolicy = schemas.ConflictPolicy.ignore,
+) -> schemas.UpsertResult:
+    """upsert_video_dynamic_bulk for pre-validated tuples in VideoDynamicCreate field order."""
+    columns = list(schemas.VideoDynamicCreate.model_fields)
+    dynamics = [schemas.VideoDynamicCreate.model_construct(**dict(zip(columns, record))) for record in records]
+    return await upsert_records(models.VideoDynamic, dynamics, policy)
+
+
+@instrument_db
+async def upsert_video_minute_bulk(
+    minutes: List[schemas.VideoMinuteCreate],
+    policy: schemas.ConflictPolicy = schemas.ConflictPolicy.ignore,
+):
+    """Insert or update video minute statistics in bulk."""
+    await minute_partitions.ensure(minute.time for minute in minutes)
+    result = await upsert_records(models.VideoMinute, minutes, policy)
+    if LEADERBOARD_ENABLED:
+        leaderboard.observe_models(minutes)
+    return result
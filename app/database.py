@@ -1,6 +1,10 @@
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 from dotenv import load_dotenv
+import asyncio
+import logging
+import time
 import os
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 
@@ -8,16 +12,65 @@ load_dotenv()
 
 PG_SCHEMA = os.getenv("PG_SCHEMA", "public")
 
+# Connection pool
+PG_POOL_SIZE = int(os.getenv("PG_POOL_SIZE", "10"))
+PG_MAX_OVERFLOW = int(os.getenv("PG_MAX_OVERFLOW", "20"))
+PG_POOL_TIMEOUT = float(os.getenv("PG_POOL_TIMEOUT", "30"))
+PG_POOL_RECYCLE = int(os.getenv("PG_POOL_RECYCLE", "1800"))
+PG_POOL_PRE_PING = os.getenv("PG_POOL_PRE_PING", "true").lower() in ("1", "true", "yes")
+PG_POOL_WARMUP = int(os.getenv("PG_POOL_WARMUP", str(PG_POOL_SIZE)))
+# Prepared statements cached per connection; set 0 behind pgbouncer in transaction mode
+PG_STATEMENT_CACHE_SIZE = int(os.getenv("PG_STATEMENT_CACHE_SIZE", "100"))
+PG_COMMAND_TIMEOUT = float(os.getenv("PG_COMMAND_TIMEOUT", "0")) or None
+# Upper bound for the readiness probe's round trip
+PG_HEALTH_TIMEOUT = float(os.getenv("PG_HEALTH_TIMEOUT", "2"))
+
 SQLALCHEMY_DATABASE_URL = (
     f"postgresql+asyncpg://"
     f"{os.getenv('PG_USER')}:{os.getenv('PG_PASSWORD')}"
     f"@{os.getenv('PG_HOST')}:{os.getenv('PG_PORT')}"
     f"/{os.getenv('PG_DATABASE')}"
+    f"?prepared_statement_cache_size={PG_STATEMENT_CACHE_SIZE}"
 )
 
+
+class InstrumentedPool(AsyncAdaptedQueuePool):
+    """Queue pool that records how long checkouts wait for a connection."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.checkouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            waited = time.perf_counter() - start
+            self.checkouts += 1
+            self.wait_total += waited
+            self.wait_max = max(self.wait_max, waited)
+
+
+# SQLAlchemy keeps its own pool loggers at WARNING; do the same for the subclass
+logging.getLogger(f"{__name__}.{InstrumentedPool.__name__}").setLevel(logging.WARNING)
+
+
 engine = create_async_engine(
     SQLALCHEMY_DATABASE_URL,
-    connect_args={"server_settings": {"search_path": PG_SCHEMA}},
+    poolclass=InstrumentedPool,
+    pool_size=PG_POOL_SIZE,
+    max_overflow=PG_MAX_OVERFLOW,
+    pool_timeout=PG_POOL_TIMEOUT,
+    pool_recycle=PG_POOL_RECYCLE,
+    pool_pre_ping=PG_POOL_PRE_PING,
+    connect_args={
+        "server_settings": {"search_path": PG_SCHEMA},
+        "statement_cache_size": PG_STATEMENT_CACHE_SIZE,
+        "command_timeout": PG_COMMAND_TIMEOUT,
+    },
 )
 
 SessionLocal = sessionmaker(
@@ -25,3 +78,48 @@ SessionLocal = sessionmaker(
 )
 
 Base = declarative_base()
+
+
+async def warmup(connections: int = PG_POOL_WARMUP):
+    """Open pooled connections up front so the first burst skips connection setup."""
+    connections = min(connections, PG_POOL_SIZE)
+    if connections <= 0:
+        return
+    # Gather every attempt so the connections that did open are closed on failure
+    opened = await asyncio.gather(
+        *[engine.connect().start() for _ in range(connections)], return_exceptions=True
+    )
+    conns = [conn for conn in opened if not isinstance(conn, BaseException)]
+    try:
+        for conn in opened:
+            if isinstance(conn, BaseException):
+                raise conn
+        await asyncio.gather(*[conn.exec_driver_sql("SELECT 1") for conn in conns])
+    finally:
+        await asyncio.gather(*[conn.close() for conn in conns], return_exceptions=True)
+
+
+async def ping(timeout: float = PG_HEALTH_TIMEOUT) -> float:
+    """Round trip `SELECT 1` through the pool; returns seconds taken.
+
+    Raises on failure, including `asyncio.TimeoutError` past `timeout`.
+    """
+    start = time.perf_counter()
+    async with asyncio.timeout(timeout):
+        async with engine.connect() as conn:
+            await conn.exec_driver_sql("SELECT 1")
+    return time.perf_counter() - start
+
+
+def pool_stats() -> dict:
+    """Snapshot of the connection pool for monitoring."""
+    pool = engine.sync_engine.pool
+    return {
+        "size": pool.size(),
+        "checked_out": pool.checkedout(),
+        "checked_in": pool.checkedin(),
+        "overflow": pool.overflow(),
+        "checkouts": pool.checkouts,
+        "wait_avg": pool.wait_total / pool.checkouts if pool.checkouts else 0.0,
+        "wait_max": pool.wait_max,
+    }
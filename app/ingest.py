@@ -0,0 +1,193 @@
+from typing import Any, AsyncIterator, Awaitable, Callable, Iterable, List, Sequence, Tuple
+from pydantic import TypeAdapter, ValidationError
+from .database import engine
+from . import schemas
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+# asyncpg allows at most 32767 bind parameters per statement
+MAX_BIND_PARAMS = 32767
+
+
+def quote(name: str) -> str:
+    """Quote a SQL identifier (video_minute has a column called "like")."""
+    return '"' + name.replace('"', '""') + '"'
+
+
+def to_records(columns: Sequence[str], data_list: Iterable[schemas.BaseModel]) -> List[tuple]:
+    """Turn Pydantic rows into tuples ordered like `columns`."""
+    return [tuple(getattr(item, column) for column in columns) for item in data_list]
+
+
+async def copy_records(model_cls, records: List[tuple], columns: Sequence[str] = None):
+    """Stream rows into a temp staging table with binary COPY, then merge them
+    into the target table with ON CONFLICT DO NOTHING.
+
+    Returns how many rows were inserted and how many were already present
+    (or repeated inside the batch).
+    """
+    table = model_cls.__table__
+    if columns is None:
+        columns = [column.name for column in table.columns]
+    total = len(records)
+    if not total:
+        return schemas.BulkIngestResult(total=0, inserted=0, duplicates=0)
+
+    stage = f"_stage_{table.name}"
+    column_list = ", ".join(quote(column) for column in columns)
+    async with engine.begin() as conn:
+        await conn.exec_driver_sql(
+            f"CREATE TEMP TABLE {quote(stage)} "
+            f"(LIKE {quote(table.name)} INCLUDING DEFAULTS) ON COMMIT DROP"
+        )
+        raw = await conn.get_raw_connection()
+        await raw.driver_connection.copy_records_to_table(
+            stage, records=records, columns=list(columns)
+        )
+        result = await conn.exec_driver_sql(
+            f"INSERT INTO {quote(table.name)} ({column_list}) "
+            f"SELECT {column_list} FROM {quote(stage)} "
+            f"ON CONFLICT DO NOTHING"
+        )
+        inserted = result.rowcount
+
+    return schemas.BulkIngestResult(
+        total=total, inserted=inserted, duplicates=total - inserted
+    )
+
+
+async def copy_models(model_cls, data_list: Iterable[schemas.BaseModel]):
+    """COPY a list of Pydantic `*Create` rows into the table of `model_cls`."""
+    columns = [column.name for column in model_cls.__table__.columns]
+    return await copy_records(model_cls, to_records(columns, data_list), columns)
+
+
+# Error messages kept per chunk summary; the count is always exact
+MAX_CHUNK_ERRORS = 20
+
+
+class RecordParser:
+    """Validate incoming rows of a `*Create` schema straight into COPY tuples.
+
+    Accepts a single row object, or a columnar block {column: [values...]}
+    validated one column at a time, without a model instance per row.
+    """
+
+    def __init__(self, schema_cls):
+        self.schema_cls = schema_cls
+        self.columns = list(schema_cls.model_fields)
+        self.column_adapters = {
+            name: TypeAdapter(List[field.annotation])
+            for name, field in schema_cls.model_fields.items()
+        }
+
+    @staticmethod
+    def is_block(value: Any) -> bool:
+        return isinstance(value, dict) and bool(value) and all(isinstance(v, list) for v in value.values())
+
+    def row(self, value: Any) -> tuple:
+        item = self.schema_cls.model_validate(value)
+        return tuple(getattr(item, column) for column in self.columns)
+
+    def block(self, value: dict) -> List[tuple]:
+        missing = [column for column in self.columns if column not in value]
+        if missing:
+            raise ValueError(f"missing columns: {', '.join(missing)}")
+        lengths = {len(value[column]) for column in self.columns}
+        if len(lengths) > 1:
+            raise ValueError("columns have different lengths")
+        values = []
+        for column in self.columns:
+            try:
+                values.append(self.column_adapters[column].validate_python(value[column]))
+            except ValidationError as e:
+                raise ValueError(f"{column}{describe(e)}") from None
+        return list(zip(*values))
+
+
+def describe(e: Exception) -> str:
+    """One-line message for a validation or JSON error."""
+    if isinstance(e, ValidationError):
+        error = e.errors()[0]
+        return "".join(f"[{loc}]" for loc in error["loc"]) + f": {error['msg']}"
+    return str(e)
+
+
+async def ndjson_values(stream: AsyncIterator[bytes]) -> AsyncIterator[Tuple[int, Any]]:
+    """Decode an NDJSON byte stream line by line, yielding (line number, value).
+
+    Lines that are not valid JSON yield the exception instead of a value.
+    """
+    buffer = b""
+    line_no = 0
+    async for data in stream:
+        buffer += data
+        lines = buffer.split(b"\n")
+        buffer = lines.pop()
+        for line in lines:
+            line_no += 1
+            if line.strip():
+                try:
+                    yield line_no, json.loads(line)
+                except ValueError as e:
+                    yield line_no, e
+    if buffer.strip():
+        try:
+            yield line_no + 1, json.loads(buffer)
+        except ValueError as e:
+            yield line_no + 1, e
+
+
+async def ingest_values(
+    parser: RecordParser,
+    values: AsyncIterator[Tuple[int, Any]],
+    write: Callable[[List[tuple]], Awaitable[schemas.BulkIngestResult]],
+    chunk_rows: int,
+) -> schemas.StreamIngestResult:
+    """Parse rows or columnar blocks as they arrive and `write` them in chunks
+    of `chunk_rows`, so memory is bounded by the chunk size, not the body.
+
+    Each chunk is committed on its own. Invalid rows are skipped and reported
+    with the chunk that was being filled when they arrived.
+    """
+    chunks: List[schemas.IngestChunkResult] = []
+    pending: List[tuple] = []
+    invalid = 0
+    errors: List[str] = []
+
+    async def flush(records: List[tuple]):
+        nonlocal invalid, errors
+        result = await write(records) if records else schemas.BulkIngestResult(total=0, inserted=0, duplicates=0)
+        chunks.append(schemas.IngestChunkResult(
+            **result.model_dump(), chunk=len(chunks), invalid=invalid, errors=errors
+        ))
+        invalid, errors = 0, []
+
+    async for line_no, value in values:
+        try:
+            if isinstance(value, Exception):
+                raise value
+            if parser.is_block(value):
+                pending.extend(parser.block(value))
+            else:
+                pending.append(parser.row(value))
+        except ValueError as e:
+            # A bad columnar block rejects all of its rows
+            invalid += max(map(len, value.values())) if parser.is_block(value) else 1
+            if len(errors) < MAX_CHUNK_ERRORS:
+                errors.append(f"line {line_no}: {describe(e)}")
+        while len(pending) >= chunk_rows:
+            await flush(pending[:chunk_rows])
+            del pending[:chunk_rows]
+    if pending or invalid or not chunks:
+        await flush(pending)
+
+    return schemas.StreamIngestResult(
+        total=sum(chunk.total for chunk in chunks),
+        inserted=sum(chunk.inserted for chunk in chunks),
+        duplicates=sum(chunk.duplicates for chunk in chunks),
+        invalid=sum(chunk.invalid for chunk in chunks),
+        chunks=chunks,
+    )
@@ -0,0 +1,392 @@
+"""In-memory growth leaderboard over the minute data being ingested.
+
+Every row that goes through `crud.add_video_minute*` updates its aid's latest
+snapshot and its growth over each window (e.g. the last hour and day). The
+history needed for that is kept downsampled to one sample per
+LEADERBOARD_STEP seconds. Rankings per (window, metric) are sorted lazily and
+reused until new data arrives, so a top-N lookup is a short scan.
+
+On start the history is rebuilt from video_minute in the background; with
+LEADERBOARD_PERSIST_INTERVAL set, current deltas are also written to the
+video_growth table for SQL consumers. With several workers each one only sees
+its own ingests, so every LEADERBOARD_RESYNC seconds it reads the minute rows
+written since its last sync (not a rebuild), and one worker at a time persists.
+"""
+
+from sqlalchemy import select, func, literal_column
+from sqlalchemy.dialects.postgresql import insert
+from array import array
+from bisect import bisect_right
+from datetime import datetime, timezone
+from dotenv import load_dotenv
+from typing import Dict, Iterable, List, Optional, Sequence
+import asyncio
+import logging
+import time
+import os
+
+from . import models, schemas, shared
+from .database import SessionLocal, engine
+from .ingest import MAX_BIND_PARAMS
+from .schemas import MINUTE_METRICS, epoch
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+UNITS = {"m": 60, "h": 3600, "d": 86400}
+
+
+def parse_windows(spec: str) -> Dict[str, int]:
+    """Parse "1h,1d" into {"1h": 3600, "1d": 86400}."""
+    windows = {}
+    for name in spec.split(","):
+        name = name.strip()
+        if name:
+            windows[name] = int(name[:-1]) * UNITS[name[-1]]
+    return windows
+
+
+LEADERBOARD_ENABLED = os.getenv("LEADERBOARD_ENABLED", "true").lower() in ("1", "true", "yes")
+LEADERBOARD_WINDOWS = parse_windows(os.getenv("LEADERBOARD_WINDOWS", "1h,1d"))
+LEADERBOARD_STEP = int(os.getenv("LEADERBOARD_STEP", "600"))  # seconds between kept history samples
+LEADERBOARD_REBUILD = float(os.getenv("LEADERBOARD_REBUILD", "1"))  # min seconds between re-sorts of a ranking
+LEADERBOARD_META_INTERVAL = float(os.getenv("LEADERBOARD_META_INTERVAL", "300"))  # type/priority/vocal reload
+LEADERBOARD_PERSIST_INTERVAL = float(os.getenv("LEADERBOARD_PERSIST_INTERVAL", "0"))  # 0 disables video_growth
+# Read new video_minute rows to pick up other workers' ingests; 0 disables
+LEADERBOARD_RESYNC = float(os.getenv("LEADERBOARD_RESYNC", "60" if shared.WEB_CONCURRENCY > 1 else "0"))
+# Each resync re-reads this many seconds before its watermark, for rows committed late
+LEADERBOARD_RESYNC_OVERLAP = float(os.getenv("LEADERBOARD_RESYNC_OVERLAP", "120"))
+# Rows dated further than this past the wall clock are ignored: one of them
+# would move `now`, and with it every window, into the future
+LEADERBOARD_SKEW = float(os.getenv("LEADERBOARD_SKEW", "300"))
+
+WIDTH = len(MINUTE_METRICS)
+
+
+class Track:
+    """Latest snapshot, downsampled history and current deltas of one aid."""
+
+    __slots__ = ("times", "values", "time", "latest", "deltas", "since")
+
+    def __init__(self):
+        self.times = array("q")
+        self.values = array("q")  # WIDTH values per entry of `times`
+        self.time = 0
+        self.latest: tuple = ()
+        self.deltas: Dict[str, tuple] = {}
+        self.since: Dict[str, int] = {}
+
+
+class Leaderboard:
+    def __init__(
+        self,
+        windows: Dict[str, int] = LEADERBOARD_WINDOWS,
+        step: int = LEADERBOARD_STEP,
+        rebuild_interval: float = LEADERBOARD_REBUILD,
+    ):
+        self.windows = windows
+        self.step = step
+        self.rebuild_interval = rebuild_interval
+        self.horizon = max(windows.values())
+        self.now = 0  # newest minute time seen, unix seconds
+        self.version = 0
+        self.ready = False
+        self.late = 0
+        self.future = 0
+        self.rebuilds = 0
+        self.lookups = 0
+        self.lookup_time_total = 0.0
+        self.persisted = 0
+        self.resyncs = 0
+        self.resynced_rows = 0
+        self.synced = 0.0  # unix seconds; resync() reads minute rows newer than this
+        self._tracks: Dict[int, Track] = {}
+        self._rankings: Dict[tuple, tuple] = {}  # (window, metric) -> (version, built_at, aids)
+        self._meta: Dict[int, tuple] = {}  # aid -> (type_id, priority)
+        self._vocals: Dict[int, set] = {}  # vocal_id -> aids
+        self._changed: set = set()
+        self._tasks: List[asyncio.Task] = []
+
+    def _observe(self, tracks: Dict[int, Track], time_: int, aid: int, values: Sequence[int]) -> bool:
+        if time_ > time.time() + LEADERBOARD_SKEW:
+            self.future += 1
+            return False
+        track = tracks.get(aid)
+        if track is None:
+            track = tracks[aid] = Track()
+        if time_ < track.time:
+            self.late += 1  # out of order; the history only moves forward
+            return False
+        if track.times and time_ == track.times[-1]:
+            track.values[-WIDTH:] = array("q", values)
+        elif not track.times or time_ - track.times[-1] >= self.step:
+            track.times.append(time_)
+            track.values.extend(values)
+        track.time = time_
+        track.latest = tuple(values)
+        # Keep one sample at or before the start of the longest window
+        drop = bisect_right(track.times, time_ - self.horizon) - 1
+        if drop > 0:
+            del track.times[:drop]
+            del track.values[:drop * WIDTH]
+        for name, seconds in self.windows.items():
+            base = max(bisect_right(track.times, time_ - seconds) - 1, 0)
+            baseline = track.values[base * WIDTH:(base + 1) * WIDTH]
+            track.deltas[name] = tuple(value - old for value, old in zip(values, baseline))
+            track.since[name] = track.times[base]
+        if time_ > self.now:
+            self.now = time_
+        return True
+
+    def observe(self, rows: Iterable[tuple]):
+        """Feed (time, aid, coin, favorite, danmaku, view, reply, share, like) rows."""
+        for row in rows:
+            if any(value is None for value in row[2:]):
+                continue
+            if self._observe(self._tracks, int(epoch(row[0])), row[1], row[2:]):
+                self._changed.add(row[1])
+        self.version += 1
+
+    def observe_models(self, minutes: Iterable[schemas.VideoMinuteBase]):
+        self.observe(
+            (minute.time, minute.aid, *[getattr(minute, metric) for metric in MINUTE_METRICS])
+            for minute in minutes
+        )
+
+    def _ranking(self, window: str, metric: str) -> List[int]:
+        key = (window, metric)
+        entry = self._rankings.get(key)
+        now = time.monotonic()
+        if entry is None or (entry[0] != self.version and now - entry[1] >= self.rebuild_interval):
+            index = MINUTE_METRICS.index(metric)
+            cutoff = self.now - self.windows[window]
+            tracks = self._tracks
+            # Only aids with data inside the window take part
+            aids = [aid for aid, track in tracks.items() if track.time > cutoff]
+            aids.sort(key=lambda aid: tracks[aid].deltas[window][index], reverse=True)
+            entry = self._rankings[key] = (self.version, now, aids)
+            self.rebuilds += 1
+        return entry[2]
+
+    def top(
+        self,
+        window: str,
+        metric: str,
+        limit: int = 50,
+        type_id: Optional[int] = None,
+        priority: Optional[int] = None,
+        vocal_id: Optional[int] = None,
+    ) -> List[dict]:
+        """The `limit` aids that grew most in `metric` over `window`."""
+        started = time.perf_counter()
+        index = MINUTE_METRICS.index(metric)
+        allowed = self._vocals.get(vocal_id, set()) if vocal_id is not None else None
+        filter_meta = type_id is not None or priority is not None
+        result = []
+        for aid in self._ranking(window, metric):
+            if allowed is not None and aid not in allowed:
+                continue
+            if filter_meta:
+                meta = self._meta.get(aid)
+                if meta is None or (type_id is not None and meta[0] != type_id) or (
+                    priority is not None and meta[1] != priority
+                ):
+                    continue
+            track = self._tracks[aid]
+            result.append({
+                "aid": aid,
+                "time": datetime.fromtimestamp(track.time, tz=timezone.utc),
+                "since": datetime.fromtimestamp(track.since[window], tz=timezone.utc),
+                "value": track.latest[index],
+                "delta": track.deltas[window][index],
+            })
+            if len(result) >= limit:
+                break
+        self.lookups += 1
+        self.lookup_time_total += time.perf_counter() - started
+        return result
+
+    async def bootstrap(self, batch_size: int = 10000) -> int:
+        """Rebuild history from video_minute: the last row per aid and step bucket."""
+        minute = models.VideoMinute
+        started = time.time()
+        since = datetime.fromtimestamp(started - self.horizon - self.step, tz=timezone.utc)
+        until = datetime.fromtimestamp(started + LEADERBOARD_SKEW, tz=timezone.utc)
+        bucket = func.floor(func.extract("epoch", minute.time) / self.step).label("bucket")
+        query = (
+            select(minute.time, minute.aid, *[getattr(minute, metric) for metric in MINUTE_METRICS], bucket)
+            .where(minute.time >= since, minute.time <= until)
+            .distinct(minute.aid, literal_column("bucket"))
+            .order_by(minute.aid, literal_column("bucket"), minute.time.desc())
+        )
+        tracks: Dict[int, Track] = {}
+        loaded = 0
+        async with SessionLocal() as db:
+            result = await db.stream(query)
+            async for rows in result.partitions(batch_size):
+                for row in rows:
+                    if all(value is not None for value in row[2:-1]):
+                        self._observe(tracks, int(epoch(row[0])), row[1], row[2:-1])
+                loaded += len(rows)
+        # Replay what was ingested meanwhile on top of the loaded history;
+        # samples the load already covers are not late arrivals
+        late = self.late
+        for aid, live in self._tracks.items():
+            for i, time_ in enumerate(live.times):
+                self._observe(tracks, time_, aid, live.values[i * WIDTH:(i + 1) * WIDTH])
+            self._observe(tracks, live.time, aid, live.latest)
+        self.late = late
+        self._tracks = tracks
+        self._changed.update(tracks)
+        self.version += 1
+        self.synced = started
+        self.ready = True
+        return loaded
+
+    async def resync(self, batch_size: int = 10000) -> int:
+        """Observe the video_minute rows written since the last bootstrap or
+        resync, including other workers' ingests. Cost follows the ingest
+        rate, not the size of the history."""
+        minute = models.VideoMinute
+        since = datetime.fromtimestamp(self.synced - LEADERBOARD_RESYNC_OVERLAP, tz=timezone.utc)
+        until = datetime.fromtimestamp(time.time() + LEADERBOARD_SKEW, tz=timezone.utc)
+        query = (
+            select(minute.time, minute.aid, *[getattr(minute, metric) for metric in MINUTE_METRICS])
+            .where(minute.time > since, minute.time <= until)
+            .order_by(minute.time)
+        )
+        newest = self.synced
+        loaded = 0
+        # Rows this worker ingested itself, or read in the overlap before,
+        # come back once more; they are not late arrivals
+        late = self.late
+        async with SessionLocal() as db:
+            result = await db.stream(query)
+            async for rows in result.partitions(batch_size):
+                self.observe(rows)
+                newest = max(newest, int(epoch(rows[-1][0])))
+                loaded += len(rows)
+        self.late = late
+        self.synced = min(newest, time.time())
+        self.resyncs += 1
+        self.resynced_rows += loaded
+        return loaded
+
+    async def refresh_meta(self, batch_size: int = 10000):
+        """Reload type_id, priority and vocals of the tracked aids."""
+        static = models.VideoStatic
+        rel = models.OlapRelVideoVocal
+        aids = list(self._tracks)
+        meta: Dict[int, tuple] = {}
+        vocals: Dict[int, set] = {}
+        async with SessionLocal() as db:
+            for start in range(0, len(aids), batch_size):
+                chunk = aids[start:start + batch_size]
+                result = await db.execute(
+                    select(static.aid, static.type_id, static.priority).where(static.aid.in_(chunk))
+                )
+                for aid, type_id, priority in result:
+                    meta[aid] = (type_id, priority)
+                result = await db.execute(select(rel.aid, rel.vocal_id).where(rel.aid.in_(chunk)))
+                for aid, vocal_id in result:
+                    vocals.setdefault(vocal_id, set()).add(aid)
+        self._meta, self._vocals = meta, vocals
+
+    async def persist(self) -> int:
+        """Upsert deltas of aids changed since the last call into video_growth."""
+        changed, self._changed = self._changed, set()
+        rows = []
+        for aid in changed:
+            track = self._tracks.get(aid)
+            if track is None or not track.deltas:
+                continue
+            for window, deltas in track.deltas.items():
+                rows.append({
+                    "aid": aid,
+                    "span": window,
+                    "time": datetime.fromtimestamp(track.time, tz=timezone.utc),
+                    "since": datetime.fromtimestamp(track.since[window], tz=timezone.utc),
+                    **dict(zip(MINUTE_METRICS, deltas)),
+                })
+        if not rows:
+            return 0
+        table = models.VideoGrowth.__table__
+        chunk_size = MAX_BIND_PARAMS // len(table.columns)
+        try:
+            async with engine.begin() as conn:
+                for start in range(0, len(rows), chunk_size):
+                    stmt = insert(table).values(rows[start:start + chunk_size])
+                    stmt = stmt.on_conflict_do_update(
+                        index_elements=["aid", "span"],
+                        set_={column.name: stmt.excluded[column.name] for column in table.columns if not column.primary_key},
+                    )
+                    await conn.execute(stmt)
+        except Exception:
+            self._changed |= changed  # retry with the next call
+            raise
+        self.persisted += len(rows)
+        return len(rows)
+
+    async def persist_leased(self) -> int:
+        """persist(), on the one worker holding the lease."""
+        if not await shared.lease("leaderboard-persist", LEADERBOARD_PERSIST_INTERVAL * 3):
+            return 0
+        return await self.persist()
+
+    async def _every(self, interval: float, job, name: str, delay: float = 0):
+        await asyncio.sleep(delay)
+        while True:
+            try:
+                await job()
+            except Exception as e:
+                logger.warning(f"Leaderboard {name} failed: {str(e)}")
+            await asyncio.sleep(interval)
+
+    async def _run(self):
+        try:
+            loaded = await self.bootstrap()
+            logger.info(f"Leaderboard loaded {loaded} samples for {len(self._tracks)} aids")
+        except Exception as e:
+            logger.warning(f"Leaderboard bootstrap failed, starting empty: {str(e)}")
+            self.ready = True
+        self._tasks.append(asyncio.create_task(self._every(LEADERBOARD_META_INTERVAL, self.refresh_meta, "metadata refresh")))
+        if LEADERBOARD_PERSIST_INTERVAL > 0:
+            self._tasks.append(asyncio.create_task(self._every(LEADERBOARD_PERSIST_INTERVAL, self.persist_leased, "persist")))
+        if LEADERBOARD_RESYNC > 0:
+            self._tasks.append(asyncio.create_task(
+                self._every(LEADERBOARD_RESYNC, self.resync, "resync", delay=LEADERBOARD_RESYNC)
+            ))
+
+    def start(self):
+        if not self._tasks:
+            self._tasks.append(asyncio.create_task(self._run()))
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        for task in self._tasks:
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self._tasks = []
+
+    def stats(self) -> dict:
+        return {
+            "ready": self.ready,
+            "tracked": len(self._tracks),
+            "samples": sum(len(track.times) for track in self._tracks.values()),
+            "now": self.now,
+            "late": self.late,
+            "future": self.future,
+            "rebuilds": self.rebuilds,
+            "lookups": self.lookups,
+            "lookup_time_avg": self.lookup_time_total / self.lookups if self.lookups else 0.0,
+            "persisted": self.persisted,
+            "resyncs": self.resyncs,
+            "resynced_rows": self.resynced_rows,
+        }
+
+
+leaderboard = Leaderboard()
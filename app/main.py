@@ -1,8 +1,24 @@
-from fastapi import FastAPI, HTTPException
-from . import crud, schemas
+from fastapi import FastAPI, HTTPException, Query, Header, Request
+from fastapi.responses import Response, StreamingResponse, PlainTextResponse, JSONResponse
+from fastapi.exceptions import RequestValidationError
+from pydantic import TypeAdapter, ValidationError
+from pydantic_core import to_json
+from contextlib import asynccontextmanager
+from . import crud, schemas, client, wbi, database, rollup, writebehind, metrics, ingest, columnar, shared
+from .resolver import resolver, IDENTIFIER_PRELOAD
+from .leaderboard import leaderboard, LEADERBOARD_ENABLED
+from .partitions import minute_partitions
+from .refresh import static_refresh
+from .cache import priority_cache, user_cache, type_cache, identifier_cache, vocal_cache, get_many
 import time
-from typing import List, Union
-from .biliapi import getSingleVideoInfo
+import json
+import asyncio
+import hashlib
+import functools
+from datetime import datetime, timezone
+from typing import List, Literal, Optional, Union
+from .biliapi import getSingleVideoInfo, getMultipleVideoInfo
+from .bvid import normalizeAid
 from sqlalchemy.exc import IntegrityError
 import logging
 
@@ -10,7 +26,87 @@ import logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-app = FastAPI()
+
+async def warm_pool():
+    try:
+        await database.warmup()
+    except Exception as e:
+        logger.warning(f"Database warm-up failed: {str(e)}")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Nothing here waits on the network: the pool warms up and the WBI keys
+    # are fetched in the background, so uvicorn binds right away
+    warmup_task = asyncio.create_task(warm_pool())
+    if shared.WEB_CONCURRENCY > 1 and shared.store.scheme == "memory":
+        logger.warning("WEB_CONCURRENCY > 1 with memory:// shared state: workers pace and cache independently")
+    shared.start()
+    wbi.keys.start()
+    rollup_task = asyncio.create_task(rollup.run_forever()) if rollup.ROLLUP_INTERVAL > 0 else None
+    if writebehind.MINUTE_WRITE_BEHIND:
+        writebehind.minute_queue.start()
+    if IDENTIFIER_PRELOAD:
+        resolver.start()
+    if LEADERBOARD_ENABLED:
+        leaderboard.start()
+    minute_partitions.start()
+    static_refresh.start()
+    yield
+    tasks = [task for task in (rollup_task, warmup_task) if task is not None]
+    for task in tasks:
+        task.cancel()
+    await static_refresh.stop()
+    await minute_partitions.stop()
+    await leaderboard.stop()
+    await resolver.stop()
+    await wbi.keys.stop()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    # Everything that touches the database is stopped before the engine goes;
+    # the write-behind queue goes last so its final flush still has the pool
+    await writebehind.minute_queue.stop()
+    await shared.stop()
+    await client.close()
+    await database.engine.dispose()
+
+
+app = FastAPI(lifespan=lifespan)
+app.add_middleware(metrics.MetricsMiddleware)
+
+
+def success(result) -> dict:
+    """Success envelope; `time` is the request's monotonic wall time so far."""
+    return {
+        "result": result,
+        "time": metrics.elapsed(),
+        "timing": metrics.breakdown(),
+        "status": "success",
+    }
+
+
+def envelope(body: bytes, **fields) -> bytes:
+    """Splice an already serialized result into the success envelope."""
+    parts = [b'{"result":', body]
+    for name, value in {**fields, "time": metrics.elapsed(), "timing": metrics.breakdown()}.items():
+        parts += [b',"', name.encode(), b'":', to_json(value)]
+    parts.append(b',"status":"success"}')
+    return b"".join(parts)
+
+
+@functools.cache
+def result_adapter(response_model) -> TypeAdapter:
+    return TypeAdapter(response_model.model_fields["result"].annotation)
+
+
+def typed_response(response_model, result, **fields) -> Response:
+    """Fast path for large results: validate once against the endpoint's typed
+    model and dump straight to JSON bytes, skipping FastAPI's `Any` round trip.
+    ORM rows are read through their attributes.
+    """
+    adapter = result_adapter(response_model)
+    with metrics.timed("serialize"):
+        body = adapter.dump_json(adapter.validate_python(result, from_attributes=True))
+    return Response(envelope(body, **fields), media_type="application/json")
 
 
 @app.get("/", response_model=Union[schemas.SuccessResponse, schemas.ErrorResponse])
@@ -23,6 +119,75 @@ def health_check_head():
     return {"status": "success"}
 
 
+async def database_health() -> dict:
+    try:
+        latency = await database.ping()
+    except Exception as e:
+        return {"ok": False, "error": f"{type(e).__name__}: {e}", "pool": database.pool_stats()}
+    return {"ok": True, "latency": latency, "pool": database.pool_stats()}
+
+
+def upstream_health() -> dict:
+    # Reported from the key manager's last refresh, without calling upstream
+    keys = wbi.keys
+    return {
+        "ok": keys.mixin_key is not None,
+        "state": "ready" if keys.mixin_key is not None else "error" if keys.last_error else "pending",
+        "key_age": keys.stats()["key_age"],
+        "last_error": keys.last_error,
+    }
+
+
+@app.get("/health")
+async def health_check(ready: bool = Query(False, description="Check database and upstream too")):
+    """Liveness by default; `?ready=true` reports database and upstream state.
+
+    Readiness answers 503 when the database is unreachable. Upstream trouble
+    only affects routes that fetch from Bilibili, so it reports "degraded".
+    """
+    if not ready:
+        return {"status": "success"}
+    db = await database_health()
+    upstream = upstream_health()
+    body = {
+        "status": "error" if not db["ok"] else "success" if upstream["ok"] else "degraded",
+        "database": db,
+        "upstream": upstream,
+        "background": {"identifier_index": resolver.loaded, "leaderboard": leaderboard.ready},
+    }
+    return JSONResponse(body, status_code=200 if db["ok"] else 503)
+
+
+def collect_stats() -> dict:
+    return {
+        "wbi": wbi.keys.stats(),
+        "shared": shared.stats(),
+        "priority_cache": priority_cache.stats(),
+        "user_cache": user_cache.stats(),
+        "type_cache": type_cache.stats(),
+        "identifier_cache": identifier_cache.stats(),
+        "vocal_cache": vocal_cache.stats(),
+        "identifier_index": resolver.stats(),
+        "pool": database.pool_stats(),
+        "rollup": rollup.stats(),
+        "minute_queue": writebehind.minute_queue.stats(),
+        "leaderboard": leaderboard.stats(),
+        "minute_partitions": minute_partitions.stats(),
+        "static_refresh": static_refresh.stats(),
+    }
+
+
+@app.get("/stats", response_model=Union[schemas.SuccessResponse, schemas.ErrorResponse])
+def get_stats():
+    return success(collect_stats())
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def get_metrics():
+    """Prometheus text format: request/db/upstream histograms plus /stats as gauges."""
+    return PlainTextResponse(metrics.render(collect_stats()), media_type="text/plain; version=0.0.4")
+
+
 @app.get(
     "/add_video_static",
     response_model=Union[schemas.SuccessResponse, schemas.ErrorResponse],
@@ -32,9 +197,12 @@ def health_check_head():
     response_model=Union[schemas.SuccessResponse, schemas.ErrorResponse],
 )
 async def add_video_static(avid: int = 0, bv: str = "", priority: int = 0):
-    time_start = time.time()
     try:
-        video_data = getSingleVideoInfo(avid, bv)
+        # Re-submitted videos are answered locally, without any upstream request
+        aid = normalizeAid(avid, bv)
+        if aid and await crud.get_video_static(aid) is not None:
+            return success("Video already exists")
+        video_data = await getSingleVideoInfo(aid or avid, bv)
         
         # Convert dict to Pydantic model
         if priority:
@@ -42,15 +210,13 @@ async def add_video_static(avid: int = 0, bv: str = "", priority: int = 0):
         video_create = schemas.VideoStaticCreate(**video_data)
         
         result = await crud.add_video_static(video_create)
-        time_end = time.time()
-        return {"result": result, "time": time_end - time_start, "status": "success"}
+        return success(result)
     except IntegrityError as e:
         # Handle duplicate key errors - treat as success
         error_msg = str(e.orig).lower()
         if "duplicate key" in error_msg:
             logger.info(f"Duplicate entry for video {avid}/{bv}, treating as success")
-            time_end = time.time()
-            return {"result": "Video already exists", "time": time_end - time_start, "status": "success"}
+            return success("Video already exists")
         else:
             # Other integrity errors (foreign key violations, etc.)
             logger.error(f"Database integrity error: {str(e)}")
@@ -70,29 +236,270 @@ async def add_video_static(avid: int = 0, bv: str = "", priority: int = 0):
             raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
 
+@app.post(
+    "/add_video_static_bulk",
+    response_model=Union[schemas.VideoStaticStatusResponse, schemas.ErrorResponse],
+)
+async def add_video_static_bulk(
+    data: List[schemas.VideoStaticRequest],
+    on_conflict: Optional[schemas.ConflictPolicy] = None,
+):
+    """Fetch and insert videos that are not stored yet.
+
+    With `on_conflict=update`, stored videos are fetched again too and
+    overwritten where Bilibili's data changed ("updated"; unchanged ones stay
+    "exists"). Their priority is kept unless the request sets one.
+    """
+    refetch = on_conflict == schemas.ConflictPolicy.update
+    try:
+        aids = [normalizeAid(item.avid, item.bv) for item in data]
+        existing = await crud.get_video_static_bulk([aid for aid in aids if aid])
+        known = {video.aid: video for video in existing}
+
+        statuses = {0: ("error", "avid 和 bv 至少需要一个")}
+        missing = {}
+        for item, aid in zip(data, aids):
+            if not aid:
+                continue
+            elif aid in known and not refetch:
+                statuses[aid] = ("exists", None)
+            elif aid not in missing:
+                stored = known.get(aid)
+                missing[aid] = item.priority if item.priority or stored is None else stored.priority
+
+        fetched = await getMultipleVideoInfo([(aid, "") for aid in missing])
+        videos = []
+        for aid, video_data in zip(missing, fetched):
+            if isinstance(video_data, Exception) or video_data.get("status") == "error":
+                message = str(video_data) if isinstance(video_data, Exception) else str(video_data["message"])
+                statuses[aid] = ("error", message)
+                continue
+            if missing[aid]:
+                video_data["priority"] = missing[aid]
+            videos.append((aid, schemas.VideoStaticCreate(**video_data)))
+
+        policy = on_conflict or schemas.ConflictPolicy.ignore
+        upsert = await crud.upsert_video_static_bulk([video for _, video in videos], policy)
+        inserted = {row["aid"] for row in upsert.inserted}
+        updated = {row["aid"] for row in upsert.updated}
+        for aid, video in videos:
+            # Skipped here means unchanged, or another request inserted it in the meantime
+            if video.aid in inserted:
+                statuses[aid] = ("inserted", None)
+            else:
+                statuses[aid] = ("updated", None) if video.aid in updated else ("exists", None)
+
+        result = []
+        for item, aid in zip(data, aids):
+            status, message = statuses[aid] if aid or not item.bv else ("error", f"不是合法的 bvid: {item.bv}")
+            result.append(schemas.VideoStaticStatus(avid=aid or item.avid, bv=item.bv, status=status, message=message))
+        return typed_response(schemas.VideoStaticStatusResponse, result)
+    except Exception as e:
+        logger.error(f"Error adding video static in bulk: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+
+
+VIDEO_STATIC_FIELDS = list(schemas.VideoStatic.model_fields)
+
+
+def make_etag(body: bytes) -> str:
+    return '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates
+
+
 @app.get(
     "/get_video_static_by_priority",
-    response_model=Union[schemas.SuccessResponse, schemas.ErrorResponse],
+    response_model=Union[schemas.VideoStaticPageResponse, schemas.ErrorResponse],
 )
-async def get_video_static_by_priority(piority: int = 0):
+async def get_video_static_by_priority(
+    piority: int = 0,
+    cursor: int = 0,
+    limit: Optional[int] = Query(None, ge=1, le=100000),
+    fields: Optional[str] = None,
+    format: Literal["json", "ndjson"] = "json",
+    if_none_match: Optional[str] = Header(None),
+):
+    """List videos by priority.
+
+    `cursor` is the last aid of the previous page, `fields` a comma-separated
+    projection such as `aid,bvid,priority`. `format=ndjson` streams one row
+    per line from a server-side cursor and ignores `limit`.
+
+    JSON pages are cached in-process until the next video_static write and
+    carry an ETag; a matching If-None-Match gets a 304.
+    """
+    columns = None
+    if fields:
+        columns = [field.strip() for field in fields.split(",") if field.strip()]
+        unknown = [column for column in columns if column not in VIDEO_STATIC_FIELDS]
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+        if limit and "aid" not in columns:
+            columns.insert(0, "aid")  # needed for next_cursor
+    if format == "ndjson":
+        async def lines():
+            async for row in crud.stream_video_static_by_priority(piority, cursor, columns):
+                yield to_json(row) + b"\n"
+
+        return StreamingResponse(lines(), media_type="application/x-ndjson")
     try:
-        time_start = time.time()
-        db_results = await crud.get_video_static_by_priority(piority)
-        # Convert SQLAlchemy models to Pydantic models
-        result = [schemas.VideoStatic.model_validate(video) for video in db_results]
-        time_end = time.time()
-        data = {
-            "result": result,
-            "time": time_end - time_start,
-            "status": "success",
-        }
-        print(f"Time: {time_end - time_start}")
-        return data
+        cache_key = (piority, cursor, limit, tuple(columns) if columns else None)
+        cached = priority_cache.get(cache_key)
+        if cached is None:
+            # Plain row dicts rather than ORM objects, even without a projection
+            result = await crud.get_video_static_by_priority(piority, cursor, limit, columns or VIDEO_STATIC_FIELDS)
+            with metrics.timed("serialize"):
+                if columns:
+                    body = to_json(result)
+                else:
+                    adapter = result_adapter(schemas.VideoStaticPageResponse)
+                    body = adapter.dump_json(adapter.validate_python(result))
+            next_cursor = result[-1]["aid"] if limit and len(result) == limit else None
+            cached = (make_etag(body), body, next_cursor)
+            priority_cache.set(cache_key, cached)
+        etag, body, next_cursor = cached
+        if etag_matches(if_none_match, etag):
+            return Response(status_code=304, headers={"ETag": etag})
+        # The cached result is spliced in as-is so hits are never re-serialized
+        return Response(envelope(body, next_cursor=next_cursor), media_type="application/json", headers={"ETag": etag})
     except Exception as e:
         logger.error(f"Error getting video static by priority: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
 
 
+async def get_cached_map(response_model, cache, keys, fetch):
+    try:
+        result = await get_many(cache, keys, fetch)
+        return typed_response(response_model, result)
+    except Exception as e:
+        logger.error(f"Error in batch lookup: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+
+
+@app.get("/get_users", response_model=Union[schemas.DimUserResponse, schemas.ErrorResponse])
+async def get_users(user_ids: List[int] = Query(..., max_length=1000)):
+    return await get_cached_map(schemas.DimUserResponse, user_cache, user_ids, crud.get_users)
+
+
+@app.get("/get_types", response_model=Union[schemas.DimTypeResponse, schemas.ErrorResponse])
+async def get_types(type_ids: List[int] = Query(..., max_length=1000)):
+    return await get_cached_map(schemas.DimTypeResponse, type_cache, type_ids, crud.get_types)
+
+
+@app.get("/get_identifier_maps", response_model=Union[schemas.IdentifierMapResponse, schemas.ErrorResponse])
+async def get_identifier_maps(identifiers: List[str] = Query(..., max_length=1000)):
+    return await get_cached_map(schemas.IdentifierMapResponse, identifier_cache, identifiers, crud.get_identifier_maps)
+
+
+@app.get("/get_video_vocals", response_model=Union[schemas.VideoVocalsResponse, schemas.ErrorResponse])
+async def get_video_vocals(aids: List[int] = Query(..., max_length=1000)):
+    return await get_cached_map(schemas.VideoVocalsResponse, vocal_cache, aids, crud.get_video_vocals_bulk)
+
+
+@app.post("/resolve_identifiers", response_model=Union[schemas.ResolveResponse, schemas.ErrorResponse])
+async def resolve_identifiers(identifiers: List[str]):
+    """Map many identifiers to aids from the in-memory index, as {identifier: aid | null}."""
+    try:
+        result = await resolver.resolve_many(identifiers)
+        return typed_response(schemas.ResolveResponse, result)
+    except Exception as e:
+        logger.error(f"Error resolving identifiers: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+
+
+@app.get("/get_video_detail", response_model=Union[schemas.VideoDetailResponse, schemas.ErrorResponse])
+async def get_video_detail(aids: List[int] = Query(..., max_length=1000)):
+    """Static info, uploader, type name and vocal ids for each aid, in one query."""
+    try:
+        result = await crud.get_video_details(aids)
+        return typed_response(schemas.VideoDetailResponse, result)
+    except Exception as e:
+        logger.error(f"Error getting video detail: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+
+
+@app.get("/get_leaderboard", response_model=Union[schemas.LeaderboardResponse, schemas.ErrorResponse])
+async def get_leaderboard(
+    metric: str = "view",
+    window: str = "1h",
+    limit: int = Query(50, ge=1, le=1000),
+    type_id: Optional[int] = None,
+    priority: Optional[int] = None,
+    vocal_id: Optional[int] = None,
+):
+    """Aids that grew most in `metric` over `window`, from the in-memory leaderboard.
+
+    Growth is measured between each aid's latest minute row and its row at
+    or before `window` earlier (the oldest kept row for recently added aids).
+    """
+    if not LEADERBOARD_ENABLED:
+        raise HTTPException(status_code=404, detail="Leaderboard is disabled")
+    if metric not in schemas.MINUTE_METRICS:
+        raise HTTPException(status_code=400, detail=f"Unknown metric: {metric}")
+    if window not in leaderboard.windows:
+        raise HTTPException(status_code=400, detail=f"Unknown window, use one of: {', '.join(leaderboard.windows)}")
+    if not leaderboard.ready:
+        raise HTTPException(status_code=503, detail="Leaderboard is still loading")
+    result = leaderboard.top(window, metric, limit, type_id, priority, vocal_id)
+    return typed_response(schemas.LeaderboardResponse, result)
+
+
+SERIES_BUCKETS = {"5m": 300, "1h": 3600, "1d": 86400}
+SERIES_MAX_AIDS = 200
+SERIES_MAX_POINTS = 10000
+
+
+@app.get(
+    "/get_video_minute_series",
+    response_model=Union[schemas.VideoMinuteSeriesResponse, schemas.ErrorResponse],
+)
+async def get_video_minute_series(
+    aids: List[int] = Query(...),
+    start: Optional[int] = None,
+    end: Optional[int] = None,
+    bucket: Literal["5m", "1h", "1d"] = "1h",
+    agg: Literal["last", "max", "delta"] = "last",
+    metric_names: Optional[str] = Query(None, alias="metrics"),
+):
+    """Bucketed view/like/coin/... curves for one or many aids.
+
+    `start`/`end` are unix timestamps (default: the last 24 hours). The result
+    is columnar: {aid: {"time": [...], "view": [...], ...}}.
+    """
+    end = end or int(time.time())
+    start = start or end - 86400
+    bucket_seconds = SERIES_BUCKETS[bucket]
+    selected = None
+    if metric_names:
+        selected = [metric.strip() for metric in metric_names.split(",") if metric.strip()]
+        unknown = [metric for metric in selected if metric not in schemas.MINUTE_METRICS]
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown metrics: {', '.join(unknown)}")
+    if len(aids) > SERIES_MAX_AIDS:
+        raise HTTPException(status_code=400, detail=f"At most {SERIES_MAX_AIDS} aids per request")
+    if end <= start or (end - start) / bucket_seconds > SERIES_MAX_POINTS:
+        raise HTTPException(status_code=400, detail="Invalid or too large time range for this bucket")
+    try:
+        result = await crud.get_video_minute_series(
+            aids,
+            datetime.fromtimestamp(start, tz=timezone.utc),
+            datetime.fromtimestamp(end, tz=timezone.utc),
+            bucket_seconds,
+            agg,
+            selected,
+        )
+        return typed_response(schemas.VideoMinuteSeriesResponse, result)
+    except Exception as e:
+        logger.error(f"Error getting video minute series: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+
+
 @app.post(
     "/add_video_minute",
     response_model=Union[schemas.SuccessResponse, schemas.ErrorResponse],
@@ -100,18 +507,20 @@ async def get_video_static_by_priority(piority: int = 0):
 async def add_video_minute(
     video_minute: schemas.VideoMinuteCreate,
 ):
-    time_start = time.time()
+    if writebehind.MINUTE_WRITE_BEHIND:
+        # Acknowledge once queued; the flusher batches rows into one COPY
+        if not writebehind.minute_queue.put(video_minute):
+            raise HTTPException(status_code=429, detail="Write queue is full, retry later")
+        return success("queued")
     try:
         result = await crud.add_video_minute(video_minute)
-        time_end = time.time()
-        return {"result": result, "time": time_end - time_start, "status": "success"}
+        return success(result)
     except IntegrityError as e:
         # Handle duplicate key errors - treat as success for minute data too
         error_msg = str(e.orig).lower()
         if "duplicate key" in error_msg:
             logger.info("Duplicate entry for video minute data, treating as success")
-            time_end = time.time()
-            return {"result": "Video minute data already exists", "time": time_end - time_start, "status": "success"}
+            return success("Video minute data already exists")
         else:
             logger.error(f"Database integrity error: {str(e)}")
             raise HTTPException(status_code=400, detail=f"Database integrity error: {str(e)}")
@@ -128,28 +537,76 @@ async def add_video_minute(
             raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
 
+VIDEO_MINUTE_LIST = TypeAdapter(List[schemas.VideoMinuteCreate])
+
+
 @app.post(
     "/add_video_minute_bulk",
     response_model=Union[schemas.SuccessResponse, schemas.ErrorResponse],
+    openapi_extra={
+        "requestBody": {
+            "required": True,
+            "content": {
+                "application/json": {
+                    "schema": {"type": "array", "items": {"$ref": "#/components/schemas/VideoMinuteCreate"}}
+                },
+                columnar.COLUMNAR_MEDIA_TYPE: {
+                    "schema": {
+                        "type": "object",
+                        "properties": {
+                            name: {"type": "array", "items": {"type": "integer"}} for name in columnar.MINUTE_COLUMNS
+                        },
+                    }
+                },
+            },
+        }
+    },
 )
 async def add_video_minute_bulk(
-    data: List[schemas.VideoMinuteCreate],
+    request: Request,
+    on_conflict: Optional[schemas.ConflictPolicy] = None,
 ):
-    time_start = time.time()
+    """Bulk insert minute rows, skipping existing ones unless `on_conflict` is set.
+
+    The body is a JSON array of VideoMinuteCreate objects, or, with
+    Content-Type `application/x-columnar+json`, one integer array per column
+    ({"time": [unix seconds...], "aid": [...], "view": [...], ...}). Columnar
+    bodies are validated with NumPy and copied without per-row models; they
+    do not support `on_conflict`.
+    """
+    body = await request.body()
+    content_type = request.headers.get("content-type", "").split(";")[0].strip()
+    records = data = None
+    if content_type == columnar.COLUMNAR_MEDIA_TYPE:
+        if on_conflict is not None:
+            raise HTTPException(status_code=400, detail="on_conflict is not supported for columnar bodies")
+        try:
+            arrays = columnar.parse_columns(json.loads(body), columnar.MINUTE_COLUMNS)
+        except columnar.ColumnarError as e:
+            raise RequestValidationError(e.errors)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=f"Invalid JSON: {str(e)}")
+        records = columnar.minute_records(arrays)
+    else:
+        try:
+            data = VIDEO_MINUTE_LIST.validate_json(body)
+        except ValidationError as e:
+            raise RequestValidationError([{**error, "loc": ("body", *error["loc"])} for error in e.errors()])
     try:
-        result = await crud.add_video_minute_bulk(data)
-        time_end = time.time()
-        print(f"Time: {time_end - time_start}")
-        return {"result": result, "time": time_end - time_start, "status": "success"}
-    except IntegrityError as e:
-        error_msg = str(e.orig).lower()
-        if "duplicate key" in error_msg:
-            logger.info("Some duplicate entries in bulk video minute data, treating as partial success")
-            time_end = time.time()
-            return {"result": "Bulk operation completed with some duplicates", "time": time_end - time_start, "status": "success"}
+        if records is not None:
+            result = await crud.add_video_minute_records(records)
+        elif on_conflict is not None:
+            # Per-key report of inserted / updated / skipped rows
+            result = await crud.upsert_video_minute_bulk(data, on_conflict)
+            return success(result)
         else:
-            logger.error(f"Database integrity error: {str(e)}")
-            raise HTTPException(status_code=400, detail=f"Database integrity error: {str(e)}")
+            result = await crud.add_video_minute_bulk(data)
+        if result.duplicates:
+            logger.info(f"Bulk video minute data: {result.duplicates} of {result.total} rows already existed")
+        return success(result)
+    except IntegrityError as e:
+        logger.error(f"Database integrity error: {str(e)}")
+        raise HTTPException(status_code=400, detail=f"Database integrity error: {str(e)}")
     except Exception as e:
         error_msg = str(e).lower()
         if "permission denied" in error_msg:
@@ -161,3 +618,86 @@ async def add_video_minute_bulk(
         else:
             logger.error(f"Unexpected error: {str(e)}")
             raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+
+
+DYNAMIC_CHUNK_ROWS = 5000
+VIDEO_DYNAMIC_PARSER = ingest.RecordParser(schemas.VideoDynamicCreate)
+
+
+@app.post(
+    "/add_video_dynamic_bulk",
+    response_model=Union[schemas.StreamIngestResponse, schemas.StreamUpsertResponse, schemas.ErrorResponse],
+    openapi_extra={
+        "requestBody": {
+            "required": True,
+            "content": {
+                "application/x-ndjson": {"schema": {"type": "string", "format": "binary"}},
+                "application/json": {
+                    "schema": {"type": "object", "additionalProperties": {"type": "array", "items": {}}}
+                },
+            },
+        }
+    },
+)
+async def add_video_dynamic_bulk(
+    request: Request,
+    chunk_rows: int = Query(DYNAMIC_CHUNK_ROWS, ge=1, le=100000),
+    on_conflict: Optional[schemas.ConflictPolicy] = None,
+):
+    """Bulk load daily snapshots (VideoDynamicCreate rows), skipping existing ones
+    unless `on_conflict` is set.
+
+    - `application/x-ndjson`: one row object per line, or per line a columnar
+      block {"record_date": [...], "aid": [...], ...}. Parsed as it streams in.
+    - `application/json`: a single columnar block.
+
+    Rows are written with COPY every `chunk_rows` rows and each chunk commits
+    on its own, so memory stays bounded and a retried upload only adds what
+    is missing. Invalid rows are skipped and reported per chunk. With
+    `on_conflict`, chunks go through INSERT ... ON CONFLICT instead of COPY
+    and the result lists the inserted, updated and skipped keys.
+    """
+    content_type = request.headers.get("content-type", "").split(";")[0].strip()
+    if content_type == "application/x-ndjson":
+        values = ingest.ndjson_values(request.stream())
+    elif content_type == "application/json":
+        try:
+            block = json.loads(await request.body())
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=f"Invalid JSON: {str(e)}")
+        if not VIDEO_DYNAMIC_PARSER.is_block(block):
+            raise HTTPException(status_code=400, detail="Expected a columnar object of arrays")
+
+        async def single_block():
+            yield 1, block
+
+        values = single_block()
+    else:
+        raise HTTPException(status_code=415, detail="Use application/x-ndjson or a columnar application/json body")
+    try:
+        if on_conflict is not None:
+            keys = {"inserted": [], "updated": [], "skipped": []}
+
+            async def upsert(records: List[tuple]) -> schemas.BulkIngestResult:
+                upserted = await crud.upsert_video_dynamic_records(records, on_conflict)
+                for outcome, rows in keys.items():
+                    rows.extend(getattr(upserted, outcome))
+                return schemas.BulkIngestResult(
+                    total=len(records), inserted=len(upserted.inserted), duplicates=len(upserted.skipped)
+                )
+
+            streamed = await ingest.ingest_values(VIDEO_DYNAMIC_PARSER, values, upsert, chunk_rows)
+            result = schemas.StreamUpsertResult(
+                **keys, invalid=streamed.invalid, errors=[error for chunk in streamed.chunks for error in chunk.errors]
+            )
+            return typed_response(schemas.StreamUpsertResponse, result)
+        result = await ingest.ingest_values(VIDEO_DYNAMIC_PARSER, values, crud.add_video_dynamic_records, chunk_rows)
+        if result.duplicates or result.invalid:
+            logger.info(
+                f"Bulk video dynamic data: {result.duplicates} of {result.total} rows already existed, "
+                f"{result.invalid} invalid"
+            )
+        return typed_response(schemas.StreamIngestResponse, result)
+    except Exception as e:
+        logger.error(f"Error adding video dynamic in bulk: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
@@ -0,0 +1,220 @@
+from contextvars import ContextVar
+from contextlib import contextmanager
+from functools import wraps
+from typing import Dict, Optional, Sequence, Tuple
+import time
+
+# Default latency buckets in seconds
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple, float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for key, value in self._values.items():
+            lines.append(f"{self.name}{format_labels(self.labelnames, key)} {value}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._values: Dict[Tuple, list] = {}  # key -> [bucket counts..., sum, count]
+
+    def observe(self, value: float, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        series = self._values.get(key)
+        if series is None:
+            series = self._values[key] = [0] * len(self.buckets) + [0.0, 0]
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                series[i] += 1
+        series[-2] += value
+        series[-1] += 1
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for key, series in self._values.items():
+            for bound, count in zip(self.buckets, series):
+                labels = format_labels(self.labelnames + ("le",), key + (repr(bound),))
+                lines.append(f"{self.name}_bucket{labels} {count}")
+            labels = format_labels(self.labelnames + ("le",), key + ("+Inf",))
+            lines.append(f"{self.name}_bucket{labels} {series[-1]}")
+            labels = format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {series[-2]}")
+            lines.append(f"{self.name}_count{labels} {series[-1]}")
+        return lines
+
+
+def format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(
+        f'{name}="{value.replace(chr(92), chr(92) * 2).replace(chr(34), chr(92) + chr(34))}"'
+        for name, value in zip(names, values)
+    )
+    return "{" + pairs + "}"
+
+
+REQUEST_SECONDS = Histogram(
+    "hantang_request_seconds", "HTTP request latency", ("method", "route", "status")
+)
+DB_SECONDS = Histogram("hantang_db_seconds", "Time spent in crud database calls", ("op",))
+DB_ERRORS = Counter("hantang_db_errors_total", "crud calls that raised", ("op", "error"))
+UPSTREAM_SECONDS = Histogram(
+    "hantang_upstream_seconds", "Bilibili API request latency", ("path", "status")
+)
+UPSTREAM_ERRORS = Counter("hantang_upstream_errors_total", "Bilibili API requests that failed", ("path", "error"))
+METRICS = [REQUEST_SECONDS, DB_SECONDS, DB_ERRORS, UPSTREAM_SECONDS, UPSTREAM_ERRORS]
+
+
+class Timings:
+    """Per-request breakdown of where the time went."""
+
+    __slots__ = ("start", "db", "upstream", "serialize")
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.db = 0.0
+        self.upstream = 0.0
+        self.serialize = 0.0
+
+
+_timings: ContextVar[Optional[Timings]] = ContextVar("timings", default=None)
+
+
+def elapsed() -> float:
+    """Seconds since the current request started, from a monotonic clock."""
+    timings = _timings.get()
+    return time.perf_counter() - timings.start if timings is not None else 0.0
+
+
+def breakdown() -> Dict[str, float]:
+    timings = _timings.get()
+    if timings is None:
+        return {}
+    return {
+        "db_ms": round(timings.db * 1000, 3),
+        "upstream_ms": round(timings.upstream * 1000, 3),
+        "serialize_ms": round(timings.serialize * 1000, 3),
+    }
+
+
+def add_time(kind: str, seconds: float):
+    timings = _timings.get()
+    if timings is not None:
+        setattr(timings, kind, getattr(timings, kind) + seconds)
+
+
+@contextmanager
+def timed(kind: str):
+    """Add the duration of the block to the current request's breakdown."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        add_time(kind, time.perf_counter() - start)
+
+
+def instrument_db(fn):
+    """Record latency and errors of a crud coroutine under its function name."""
+    op = fn.__name__
+
+    @wraps(fn)
+    async def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return await fn(*args, **kwargs)
+        except Exception as e:
+            DB_ERRORS.inc(op=op, error=type(e).__name__)
+            raise
+        finally:
+            seconds = time.perf_counter() - start
+            DB_SECONDS.observe(seconds, op=op)
+            add_time("db", seconds)
+
+    return wrapper
+
+
+def observe_upstream(path: str, status: str, seconds: float):
+    UPSTREAM_SECONDS.observe(seconds, path=path, status=status)
+    add_time("upstream", seconds)
+
+
+class MetricsMiddleware:
+    """ASGI middleware timing every HTTP request and adding a Server-Timing header."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        timings = Timings()
+        token = _timings.set(timings)
+        status = 500
+
+        async def send_with_timing(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                server_timing = (
+                    f"db;dur={timings.db * 1000:.3f}, "
+                    f"upstream;dur={timings.upstream * 1000:.3f}, "
+                    f"serialize;dur={timings.serialize * 1000:.3f}, "
+                    f"total;dur={(time.perf_counter() - timings.start) * 1000:.3f}"
+                )
+                message["headers"] = list(message.get("headers", [])) + [
+                    (b"server-timing", server_timing.encode())
+                ]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            route = scope.get("route")
+            REQUEST_SECONDS.observe(
+                time.perf_counter() - timings.start,
+                method=scope["method"],
+                route=getattr(route, "path", "unmatched"),
+                status=status,
+            )
+            _timings.reset(token)
+
+
+def flatten(prefix: str, stats: dict) -> list:
+    """Turn nested numeric stats into (name, value) gauge samples."""
+    samples = []
+    for key, value in stats.items():
+        name = f"{prefix}_{key}"
+        if isinstance(value, dict):
+            samples.extend(flatten(name, value))
+        elif isinstance(value, bool):
+            samples.append((name, int(value)))
+        elif isinstance(value, (int, float)):
+            samples.append((name, value))
+    return samples
+
+
+def render(stats: Optional[dict] = None) -> str:
+    """Prometheus text exposition of all metrics plus `stats` as gauges."""
+    lines = []
+    for metric in METRICS:
+        lines.extend(metric.render())
+    for name, value in flatten("hantang", stats or {}):
+        lines.append(f"# TYPE {name} gauge")
+        lines.append(f"{name} {value}")
+    return "\n".join(lines) + "\n"
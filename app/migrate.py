@@ -0,0 +1,133 @@
+"""Apply the SQL migrations in migrations/ to the configured database.
+
+    python -m app.migrate            # apply pending migrations
+    python -m app.migrate --list     # show applied and pending
+
+Migrations are plain SQL files named NNNN_description.sql, applied in order
+and recorded in the schema_migrations table. Each file runs in one
+transaction, unless its first line is `-- no-transaction` (needed for
+CREATE INDEX CONCURRENTLY): its statements then run one by one, each in its
+own transaction, and must each end with a semicolon at the end of a line
+(semicolons inside $$-quoted DO blocks do not count). Write such files to be
+rerunnable (IF NOT EXISTS), since a failure leaves them half applied.
+
+An advisory lock keeps concurrent runs (several hosts deploying at once)
+from applying the same file twice.
+"""
+
+from typing import List, Tuple
+import argparse
+import asyncio
+import logging
+import os
+import re
+
+from .database import engine
+
+logger = logging.getLogger(__name__)
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "migrations")
+NO_TRANSACTION = "-- no-transaction"
+# Arbitrary key for pg_advisory_lock, shared by every migrate run
+LOCK_ID = 0x68616E74
+
+FILENAME = re.compile(r"^(\d+)_(\w+)\.sql$")
+
+
+def discover(directory: str = MIGRATIONS_DIR) -> List[Tuple[str, str, str]]:
+    """(version, name, path) of every migration file, in version order."""
+    migrations = []
+    for filename in os.listdir(directory):
+        match = FILENAME.match(filename)
+        if match:
+            migrations.append((match[1], match[2], os.path.join(directory, filename)))
+    return sorted(migrations)
+
+
+def statements(sql: str) -> List[str]:
+    """Split a script on semicolons that end a line, outside $$ quotes."""
+    found, current, quoted = [], [], False
+    for line in sql.splitlines():
+        current.append(line)
+        quoted ^= line.count("$$") % 2 == 1
+        if not quoted and line.rstrip().endswith(";"):
+            found.append("\n".join(current))
+            current = []
+    found.append("\n".join(current))
+    return [statement.strip() for statement in found if strip_comments(statement)]
+
+
+def strip_comments(sql: str) -> str:
+    return "\n".join(line for line in sql.splitlines() if not line.strip().startswith("--")).strip()
+
+
+async def migrate(directory: str = MIGRATIONS_DIR, dry_run: bool = False) -> List[str]:
+    """Apply pending migrations; returns the versions applied (or pending, with dry_run)."""
+    done = []
+    async with engine.connect() as conn:
+        # asyncpg directly: multi-statement scripts and explicit transactions
+        raw = (await conn.get_raw_connection()).driver_connection
+        await raw.execute("SELECT pg_advisory_lock($1)", LOCK_ID)
+        try:
+            await raw.execute(
+                """
+                CREATE TABLE IF NOT EXISTS schema_migrations (
+                    version TEXT PRIMARY KEY,
+                    name TEXT NOT NULL,
+                    applied_at TIMESTAMPTZ NOT NULL DEFAULT now()
+                )
+                """
+            )
+            applied = {row["version"] for row in await raw.fetch("SELECT version FROM schema_migrations")}
+            for version, name, path in discover(directory):
+                if version in applied:
+                    continue
+                done.append(version)
+                if dry_run:
+                    continue
+                with open(path, encoding="utf-8") as f:
+                    sql = f.read()
+                logger.info(f"Applying migration {version}_{name}")
+                record = "INSERT INTO schema_migrations (version, name) VALUES ($1, $2)"
+                if sql.startswith(NO_TRANSACTION):
+                    for statement in statements(sql):
+                        await raw.execute(statement)
+                    await raw.execute(record, version, name)
+                else:
+                    async with raw.transaction():
+                        await raw.execute(sql)
+                        await raw.execute(record, version, name)
+        finally:
+            await raw.execute("SELECT pg_advisory_unlock($1)", LOCK_ID)
+    return done
+
+
+async def status(directory: str = MIGRATIONS_DIR) -> List[Tuple[str, str, object]]:
+    """(version, name, applied_at or None) for every migration file."""
+    async with engine.connect() as conn:
+        raw = (await conn.get_raw_connection()).driver_connection
+        exists = await raw.fetchval("SELECT to_regclass('schema_migrations') IS NOT NULL")
+        rows = await raw.fetch("SELECT version, applied_at FROM schema_migrations") if exists else []
+    applied = {row["version"]: row["applied_at"] for row in rows}
+    return [(version, name, applied.get(version)) for version, name, _ in discover(directory)]
+
+
+async def main(args):
+    try:
+        if args.list:
+            for version, name, applied_at in await status():
+                print(f"{version}_{name:<40} {applied_at or 'pending'}")
+        else:
+            done = await migrate(dry_run=args.dry_run)
+            verb = "Pending" if args.dry_run else "Applied"
+            print(f"{verb}: {', '.join(done)}" if done else "Up to date")
+    finally:
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--list", action="store_true", help="show applied and pending migrations")
+    parser.add_argument("--dry-run", action="store_true", help="list what would be applied")
+    asyncio.run(main(parser.parse_args()))
@@ -6,6 +6,7 @@ from sqlalchemy import (
     Text,
     Date,
     DateTime,
+    Index,
 )
 
 from .database import Base
@@ -39,6 +40,8 @@ class IdentifierMap(Base):
     aid = Column(BigInteger, comment="视频的 AV 号")
     stat = Column(Integer, comment="状态")  # 只看到了1
 
+    __table_args__ = (Index("ix_identifier_map_identifier", identifier),)
+
 
 class OlapRelVideoVocal(Base):
     __tablename__ = "olap_rel_video_vocal"
@@ -76,6 +79,28 @@ class VideoMinute(Base):
     share = Column(Integer, comment="分享")
     like = Column(Integer, comment="点赞")
 
+    # 主键以 time 开头, 按 aid 查询需要这个索引; 按 time 分区, 分区由 app/partitions.py 创建
+    __table_args__ = (
+        Index("ix_video_minute_aid_time", aid, time.desc()),
+        {"postgresql_partition_by": "RANGE (time)"},
+    )
+
+
+class VideoMinuteHourly(Base):
+    __tablename__ = "video_minute_hourly"
+    time = Column(DateTime(timezone=True), primary_key=True, comment="整点时间")
+    aid = Column(BigInteger, primary_key=True, comment="视频的 AV 号")
+    coin = Column(Integer, comment="硬币")
+    favorite = Column(Integer, comment="收藏")
+    danmaku = Column(Integer, comment="弹幕")
+    view = Column(Integer, comment="播放")
+    reply = Column(Integer, comment="评论")
+    share = Column(Integer, comment="分享")
+    like = Column(Integer, comment="点赞")
+
+    # 超过保留期的分钟数据压缩成每小时最后一条
+    __table_args__ = (Index("ix_video_minute_hourly_aid_time", aid, time.desc()),)
+
 
 class VideoStatic(Base):
     __tablename__ = "video_static"
@@ -94,3 +119,31 @@ class VideoStatic(Base):
     user_id = Column(BigInteger, comment="UP主 ID")
     priority = Column(Integer, comment="优先级")
     updated_at = Column(DateTime(timezone=True), comment="更新时间")
+
+    # 优先级列表按 aid 分页, 只索引有优先级的行
+    # 元数据刷新 (app/refresh.py) 按优先级和更新时间挑选过期的行
+    __table_args__ = (
+        Index("ix_video_static_priority", aid, priority, postgresql_where=priority.isnot(None)),
+        Index("ix_video_static_refresh", priority.asc().nulls_last(), updated_at.asc().nulls_first(), aid),
+    )
+
+
+class EtlWatermark(Base):
+    __tablename__ = "etl_watermark"
+    name = Column(String(64), primary_key=True, comment="任务名")
+    value = Column(DateTime(timezone=True), nullable=False, comment="已处理到的时间")
+
+
+class VideoGrowth(Base):
+    __tablename__ = "video_growth"
+    aid = Column(BigInteger, primary_key=True, comment="视频的 AV 号")
+    span = Column(String(16), primary_key=True, comment="统计窗口, 如 1h / 1d")
+    time = Column(DateTime(timezone=True), nullable=False, comment="最新记录时间")
+    since = Column(DateTime(timezone=True), nullable=False, comment="窗口起点的记录时间")
+    coin = Column(Integer, comment="硬币增量")
+    favorite = Column(Integer, comment="收藏增量")
+    danmaku = Column(Integer, comment="弹幕增量")
+    view = Column(Integer, comment="播放增量")
+    reply = Column(Integer, comment="评论增量")
+    share = Column(Integer, comment="分享增量")
+    like = Column(Integer, comment="点赞增量")
@@ -0,0 +1,326 @@
+"""Time partitions of video_minute: creation, retention and compaction.
+
+video_minute is range-partitioned on `time` (migrations/0002) into day or
+week partitions, MINUTE_PARTITION_INTERVAL. This module keeps
+MINUTE_PARTITION_AHEAD future partitions created in the background, since
+creating one briefly locks the parent table. Writes also call ensure(), which
+creates any partition their rows are missing, so late or far-future rows
+never fail.
+
+With MINUTE_RETENTION_DAYS set, partitions that end before the cutoff are
+downsampled into video_minute_hourly (the last row of each hour per aid) and
+then detached. They are kept as video_minute_archive_* tables, or dropped
+with MINUTE_RETENTION_DROP. Reads that reach back before the oldest raw
+partition take the older part from the hourly table (raw_since()).
+That boundary is kept in etl_watermark and only moves forward. A late row
+for a compacted day re-creates its raw partition, but reads ignore it there,
+and the next compaction merges it into the hourly table.
+
+Workers keep their own copy of the partition bounds. Creating or compacting
+partitions bumps the shared "minute_partitions" generation, and the other
+workers reload their bounds at their next lookup (see app/shared.py).
+
+    python -m app.partitions           # create partitions and compact once
+"""
+
+from bisect import bisect_right
+from datetime import datetime, timezone
+from dotenv import load_dotenv
+from typing import Iterable, List, Optional, Tuple
+import asyncio
+import logging
+import math
+import re
+import time
+import os
+
+from . import models, shared
+from .database import engine
+from .ingest import quote
+from .schemas import MINUTE_METRICS, epoch
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+INTERVALS = {"day": 86400, "week": 7 * 86400}
+
+MINUTE_PARTITION_INTERVAL = os.getenv("MINUTE_PARTITION_INTERVAL", "day")  # day or week
+MINUTE_PARTITION_AHEAD = int(os.getenv("MINUTE_PARTITION_AHEAD", "3"))  # future partitions kept ready
+MINUTE_RETENTION_DAYS = float(os.getenv("MINUTE_RETENTION_DAYS", "0"))  # raw minute rows kept, 0 keeps all
+MINUTE_RETENTION_DROP = os.getenv("MINUTE_RETENTION_DROP", "false").lower() in ("1", "true", "yes")
+MINUTE_MAINTENANCE_INTERVAL = float(os.getenv("MINUTE_MAINTENANCE_INTERVAL", "3600"))  # seconds
+
+# Weeks start on Monday; the epoch was a Thursday
+WEEK_OFFSET = 4 * 86400
+
+BOUND = re.compile(r"FROM \((.+?)\) TO \((.+?)\)")
+# Arbitrary key for pg_advisory_xact_lock around partition DDL
+LOCK_ID = 0x6D696E70
+
+
+def parse_bound(value: str) -> float:
+    if value == "MINVALUE":
+        return -math.inf
+    if value == "MAXVALUE":
+        return math.inf
+    return datetime.fromisoformat(value.strip("'")).timestamp()
+
+
+def utc(seconds: float) -> datetime:
+    return datetime.fromtimestamp(seconds, tz=timezone.utc)
+
+
+class PartitionManager:
+    def __init__(
+        self,
+        table: str = models.VideoMinute.__tablename__,
+        hourly: str = models.VideoMinuteHourly.__tablename__,
+        interval: str = MINUTE_PARTITION_INTERVAL,
+        ahead: int = MINUTE_PARTITION_AHEAD,
+        retention_days: float = MINUTE_RETENTION_DAYS,
+    ):
+        self.table = table
+        self.hourly = hourly
+        self.interval = INTERVALS[interval]
+        self.offset = WEEK_OFFSET if interval == "week" else 0
+        self.ahead = ahead
+        self.retention = retention_days * 86400
+        self.partitioned: Optional[bool] = None  # None until load()
+        self.created = 0
+        self.compacted = 0
+        self.compacted_rows = 0
+        self.last_run: Optional[float] = None
+        self.reloads = 0
+        self._stale = False
+        self.watermark = f"{table}_compacted"  # etl_watermark row: end of the compacted history
+        self._compacted_until: Optional[float] = None  # unix seconds
+        self._bounds: List[Tuple[float, float, str]] = []  # (start, end, name), sorted
+        self._starts: List[float] = []
+        self._lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    async def _load(self, conn):
+        kind = await conn.fetchval("SELECT relkind::text FROM pg_class WHERE oid = to_regclass($1)", self.table)
+        self.partitioned = kind == "p"
+        bounds = []
+        if self.partitioned:
+            rows = await conn.fetch(
+                """
+                SELECT c.relname, pg_get_expr(c.relpartbound, c.oid) AS bound
+                FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+                WHERE i.inhparent = to_regclass($1)
+                """,
+                self.table,
+            )
+            for row in rows:
+                match = BOUND.search(row["bound"])
+                if match:
+                    bounds.append((parse_bound(match[1]), parse_bound(match[2]), row["relname"]))
+        bounds.sort()
+        self._bounds = bounds
+        self._starts = [start for start, _, _ in bounds]
+        compacted = await conn.fetchval("SELECT value FROM etl_watermark WHERE name = $1", self.watermark)
+        self._compacted_until = compacted.timestamp() if compacted else None
+
+    async def load(self):
+        """Read whether the table is partitioned and its current partitions."""
+        self._stale = False
+        async with engine.connect() as conn:
+            await self._load((await conn.get_raw_connection()).driver_connection)
+        self.reloads += 1
+
+    def clear(self):
+        # Cache interface for shared.register_cache: another worker changed the partitions
+        self._stale = True
+
+    async def refresh(self):
+        """Load the partitions if not loaded yet or changed by another worker."""
+        if self.partitioned is None or self._stale:
+            await self.load()
+
+    def find(self, seconds: float) -> Optional[Tuple[float, float, str]]:
+        i = bisect_right(self._starts, seconds) - 1
+        if i >= 0 and seconds < self._bounds[i][1]:
+            return self._bounds[i]
+        return None
+
+    def bucket(self, seconds: float) -> float:
+        return (seconds - self.offset) // self.interval * self.interval + self.offset
+
+    def raw_since(self) -> Optional[datetime]:
+        """End of the compacted history: older minute data is read from the
+        hourly table, even where a late row re-created a raw partition."""
+        if self._compacted_until is not None:
+            return utc(self._compacted_until)
+        # Compacted before the boundary was recorded
+        if not self._bounds or self._bounds[0][0] == -math.inf:
+            return None
+        return utc(self._bounds[0][0])
+
+    async def ensure(self, times: Iterable):
+        """Create the partitions any of `times` would be missing."""
+        await self.refresh()
+        if not self.partitioned:
+            return
+        seconds = [epoch(value) for value in times]
+        if not seconds:
+            return
+        first = self.find(min(seconds))
+        if first is not None and first is self.find(max(seconds)):
+            return  # the usual case: one batch, one partition
+        missing = {self.bucket(value) for value in seconds if self.find(value) is None}
+        if missing:
+            await self.create(sorted(missing))
+
+    async def create(self, starts: List[float]) -> int:
+        """Create the partitions starting at `starts` (bucket boundaries),
+        trimmed to the gaps between existing partitions. Returns how many."""
+        created = 0
+        async with self._lock, engine.connect() as conn:
+            raw = (await conn.get_raw_connection()).driver_connection
+            async with raw.transaction():
+                # Serializes with other workers, then sees their partitions
+                await raw.execute("SELECT pg_advisory_xact_lock($1)", LOCK_ID)
+                await self._load(raw)
+                for start in starts:
+                    end = start + self.interval
+                    existing = self.find(start)
+                    while existing is not None and start < end:
+                        start = existing[1]
+                        existing = self.find(start)
+                    following = bisect_right(self._starts, start)
+                    if following < len(self._bounds):
+                        end = min(end, self._bounds[following][0])
+                    if start >= end:
+                        continue
+                    name = f"{self.table}_p{utc(start):%Y%m%d}"
+                    await raw.execute(
+                        f"CREATE TABLE {quote(name)} PARTITION OF {quote(self.table)} "
+                        f"FOR VALUES FROM ('{utc(start).isoformat()}') TO ('{utc(end).isoformat()}')"
+                    )
+                    logger.info(f"Created partition {name} [{utc(start)}, {utc(end)})")
+                    self._bounds.append((start, end, name))
+                    self._bounds.sort()
+                    self._starts = [bound[0] for bound in self._bounds]
+                    created += 1
+        self.created += created
+        if created:
+            await shared.invalidate("minute_partitions")
+        return created
+
+    async def premake(self):
+        """Make sure the current and the next `ahead` partitions exist."""
+        await self.refresh()
+        if self.partitioned:
+            # Whole buckets, not just their starts: the first one after the
+            # legacy partition is only partly covered
+            now = self.bucket(time.time())
+            await self.create([now + i * self.interval for i in range(self.ahead + 1)])
+
+    async def compact(self) -> int:
+        """Downsample and detach partitions older than the retention period.
+        Returns how many partitions were compacted."""
+        if self.retention <= 0 or not self.partitioned:
+            return 0
+        cutoff = time.time() - self.retention
+        expired = [bound for bound in self._bounds if bound[1] <= cutoff]
+        if not expired or not await shared.lease("minute-retention", MINUTE_MAINTENANCE_INTERVAL * 3):
+            return 0
+        columns = ", ".join(quote(metric) for metric in MINUTE_METRICS)
+        last = ", ".join(f"(array_agg({quote(m)} ORDER BY time DESC))[1]" for m in MINUTE_METRICS)
+        # Counters only grow, so a late re-compaction of the same hour keeps the larger values
+        merge = ", ".join(f"{quote(m)} = GREATEST(target.{quote(m)}, excluded.{quote(m)})" for m in MINUTE_METRICS)
+        compacted = 0
+        async with engine.connect() as conn:
+            raw = (await conn.get_raw_connection()).driver_connection
+            try:
+                for start, end, name in expired:
+                    status = await raw.execute(
+                        f"INSERT INTO {quote(self.hourly)} AS target (time, aid, {columns}) "
+                        f"SELECT date_trunc('hour', time, 'UTC'), aid, {last} FROM {quote(name)} GROUP BY 1, 2 "
+                        f"ON CONFLICT (time, aid) DO UPDATE SET {merge}"
+                    )
+                    rows = int(status.rsplit(" ", 1)[-1])
+                    await raw.execute(
+                        "INSERT INTO etl_watermark (name, value) VALUES ($1, $2) ON CONFLICT (name) "
+                        "DO UPDATE SET value = GREATEST(etl_watermark.value, excluded.value)",
+                        self.watermark, utc(end),
+                    )
+                    # CONCURRENTLY only waits for running queries instead of blocking new ones
+                    await raw.execute(f"ALTER TABLE {quote(self.table)} DETACH PARTITION {quote(name)} CONCURRENTLY")
+                    if MINUTE_RETENTION_DROP:
+                        await raw.execute(f"DROP TABLE {quote(name)}")
+                    else:
+                        archive = name.replace(self.table, f"{self.table}_archive", 1)
+                        if await raw.fetchval("SELECT to_regclass($1) IS NOT NULL", archive):
+                            archive = f"{archive}_{int(time.time())}"  # late rows compacted again
+                        await raw.execute(f"ALTER TABLE {quote(name)} RENAME TO {quote(archive)}")
+                    logger.info(f"Compacted partition {name} into {rows} hourly rows")
+                    self.compacted += 1
+                    self.compacted_rows += rows
+                    compacted += 1
+            finally:
+                # Also after a failure: earlier partitions may already be detached
+                await self._load(raw)
+                if compacted:
+                    await shared.invalidate("minute_partitions")
+        return compacted
+
+    async def run_once(self):
+        await self.load()
+        await self.premake()
+        await self.compact()
+        self.last_run = time.time()
+
+    async def _run(self):
+        while True:
+            try:
+                await self.run_once()
+            except Exception as e:
+                logger.warning(f"Partition maintenance failed: {str(e)}")
+            await asyncio.sleep(MINUTE_MAINTENANCE_INTERVAL)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> dict:
+        raw_since = self.raw_since()
+        return {
+            "partitioned": self.partitioned,
+            "partitions": len(self._bounds),
+            "newest_end": utc(self._bounds[-1][1]).isoformat() if self._bounds else None,
+            "raw_since": raw_since.isoformat() if raw_since else None,
+            "reloads": self.reloads,
+            "created": self.created,
+            "compacted": self.compacted,
+            "compacted_rows": self.compacted_rows,
+            "last_run_age": time.time() - self.last_run if self.last_run else None,
+        }
+
+
+minute_partitions = PartitionManager()
+shared.register_cache("minute_partitions", minute_partitions)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+
+    async def main():
+        try:
+            await minute_partitions.run_once()
+            print(minute_partitions.stats())
+        finally:
+            await engine.dispose()
+
+    asyncio.run(main())
@@ -0,0 +1,199 @@
+"""Incremental refresh of video_static metadata from Bilibili.
+
+Titles, tags, covers and type_id change after upload, but video_static only
+sees them once, at insert. This scheduler revisits rows whose updated_at is
+older than STATIC_REFRESH_MAX_AGE (or was never set), most urgent first:
+rows with a priority before rows without one, lower numbers first, and the
+longest unrefreshed first within a priority. Every STATIC_REFRESH_INTERVAL
+seconds it refetches one batch of STATIC_REFRESH_BATCH videos through the
+rate-limited client and writes back only the columns that differ from the
+stored row. updated_at is stamped either way, so it means "last checked".
+
+Videos Bilibili reports as gone are stamped too, so they wait a full
+STATIC_REFRESH_MAX_AGE before the next try; transient failures are retried
+after STATIC_REFRESH_RETRY seconds. With several workers one holds the lease
+and runs the batches.
+
+    python -m app.refresh        # refresh one batch and print stats
+"""
+
+from sqlalchemy import select, update, func, or_
+from datetime import datetime, timedelta, timezone
+from dotenv import load_dotenv
+from typing import Dict, List, Optional, Tuple
+import asyncio
+import logging
+import time
+import os
+
+from . import client, models, schemas, shared
+from .biliapi import getMultipleVideoInfo
+from .database import SessionLocal, engine
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+STATIC_REFRESH_INTERVAL = float(os.getenv("STATIC_REFRESH_INTERVAL", "0"))  # seconds, 0 disables the background task
+STATIC_REFRESH_BATCH = int(os.getenv("STATIC_REFRESH_BATCH", "50"))  # videos refetched per interval
+STATIC_REFRESH_MAX_AGE = float(os.getenv("STATIC_REFRESH_MAX_AGE", "604800"))  # seconds before a row is stale
+STATIC_REFRESH_RETRY = float(os.getenv("STATIC_REFRESH_RETRY", "3600"))  # seconds before retrying a failed fetch
+
+# Columns getSingleVideoInfo returns; priority and aid are ours
+FIELDS = ["bvid", "pubdate", "title", "description", "tag", "pic", "type_id", "user_id"]
+# Business codes meaning the video is deleted, hidden or under review
+GONE_CODES = {-404, 62002, 62004, 62012}
+
+
+class StaticRefresher:
+    def __init__(
+        self,
+        batch_size: int = STATIC_REFRESH_BATCH,
+        max_age: float = STATIC_REFRESH_MAX_AGE,
+        interval: float = STATIC_REFRESH_INTERVAL,
+    ):
+        self.batch_size = batch_size
+        self.max_age = max_age
+        self.interval = interval
+        self.batches = 0
+        self.checked = 0
+        self.changed = 0
+        self.gone = 0
+        self.failed = 0
+        self.columns: Dict[str, int] = {}  # column -> times it changed
+        self.backlog: Optional[int] = None
+        self.busy = 0.0  # seconds spent in batches
+        self.last_batch: Optional[dict] = None
+        self.last_run: Optional[float] = None
+        self._retry: Dict[int, float] = {}  # aid -> monotonic time it may be fetched again
+        self._task: Optional[asyncio.Task] = None
+
+    def stale(self):
+        static = models.VideoStatic
+        cutoff = datetime.now(timezone.utc) - timedelta(seconds=self.max_age)
+        return or_(static.updated_at.is_(None), static.updated_at < cutoff)
+
+    async def pick(self, db) -> List[models.VideoStatic]:
+        static = models.VideoStatic
+        now = time.monotonic()
+        self._retry = {aid: at for aid, at in self._retry.items() if at > now}
+        query = select(static).where(self.stale())
+        if self._retry:
+            query = query.where(static.aid.not_in(list(self._retry)))
+        query = query.order_by(
+            static.priority.asc().nulls_last(), static.updated_at.asc().nulls_first(), static.aid
+        ).limit(self.batch_size)
+        return list((await db.execute(query)).scalars())
+
+    def diff(self, row: models.VideoStatic, data: dict) -> dict:
+        fresh = schemas.VideoStaticCreate(**data)
+        return {
+            field: getattr(fresh, field) for field in FIELDS if getattr(fresh, field) != getattr(row, field)
+        }
+
+    async def run_batch(self) -> int:
+        """Refresh one batch of stale rows; returns how many were checked."""
+        started = time.perf_counter()
+        async with SessionLocal() as db:
+            rows = await self.pick(db)
+        updates: List[Tuple[int, dict]] = []
+        failed = gone = 0
+        if rows:
+            fetched = await getMultipleVideoInfo([(row.aid, "") for row in rows])
+            for row, data in zip(rows, fetched):
+                if isinstance(data, Exception) or (
+                    data.get("status") == "error" and data["message"].get("code") not in GONE_CODES
+                ):
+                    failed += 1
+                    self._retry[row.aid] = time.monotonic() + STATIC_REFRESH_RETRY
+                elif data.get("status") == "error":
+                    gone += 1
+                    updates.append((row.aid, {}))
+                else:
+                    updates.append((row.aid, self.diff(row, data)))
+        changed = [values for _, values in updates if values]
+        if updates:
+            now = datetime.now(timezone.utc)
+            static = models.VideoStatic
+            async with SessionLocal() as db:
+                for aid, values in updates:
+                    await db.execute(update(static).where(static.aid == aid).values(**values, updated_at=now))
+                await db.commit()
+            if changed:
+                await shared.invalidate("priority")
+        async with SessionLocal() as db:
+            self.backlog = await db.scalar(select(func.count()).select_from(models.VideoStatic).where(self.stale()))
+
+        elapsed = time.perf_counter() - started
+        for values in changed:
+            for column in values:
+                self.columns[column] = self.columns.get(column, 0) + 1
+        self.batches += 1
+        self.checked += len(updates)
+        self.changed += len(changed)
+        self.gone += gone
+        self.failed += failed
+        self.busy += elapsed
+        self.last_run = time.time()
+        self.last_batch = {
+            "rows": len(rows), "changed": len(changed), "gone": gone, "failed": failed, "seconds": elapsed,
+        }
+        return len(updates)
+
+    async def _run(self):
+        while True:
+            try:
+                if await shared.lease("static-refresh", self.interval * 3):
+                    await self.run_batch()
+            except Exception as e:
+                logger.warning(f"Static refresh failed: {str(e)}")
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        if self._task is None and self.interval > 0:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> dict:
+        # At most batch_size rows per interval, whatever the upstream speed
+        capacity = self.batch_size / self.interval if self.interval > 0 else None
+        return {
+            "batches": self.batches,
+            "checked": self.checked,
+            "changed": self.changed,
+            "gone": self.gone,
+            "failed": self.failed,
+            "retry_pending": len(self._retry),
+            "columns": dict(self.columns),
+            "rows_per_second": self.checked / self.busy if self.busy else None,
+            "capacity_per_second": capacity,
+            "backlog": self.backlog,
+            "backlog_eta": self.backlog / capacity if capacity and self.backlog is not None else None,
+            "last_batch": self.last_batch,
+            "last_run_age": time.time() - self.last_run if self.last_run else None,
+        }
+
+
+static_refresh = StaticRefresher()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+
+    async def main():
+        try:
+            await static_refresh.run_batch()
+            print(static_refresh.stats())
+        finally:
+            await client.close()
+            await engine.dispose()
+
+    asyncio.run(main())
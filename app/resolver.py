@@ -0,0 +1,122 @@
+from sqlalchemy import select
+from dotenv import load_dotenv
+from typing import Dict, Iterable, Optional
+import asyncio
+import logging
+import time
+import os
+
+from . import crud, models
+from .database import SessionLocal
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+IDENTIFIER_PRELOAD = os.getenv("IDENTIFIER_PRELOAD", "true").lower() in ("1", "true", "yes")
+IDENTIFIER_REFRESH_INTERVAL = float(os.getenv("IDENTIFIER_REFRESH_INTERVAL", "60"))  # seconds
+
+
+class IdentifierResolver:
+    """In-memory identifier -> aid index over identifier_map.
+
+    The whole table is loaded once, then new rows are picked up by `id`
+    watermark. Identifiers not in memory fall back to one batched query.
+    Changes to rows that already exist (same id) are not picked up.
+    """
+
+    def __init__(self, refresh_interval: float = IDENTIFIER_REFRESH_INTERVAL):
+        self.refresh_interval = refresh_interval
+        self.watermark = 0
+        self.loaded = False
+        self.refreshed_at = 0.0
+        self.hits = 0
+        self.misses = 0
+        self.fallback_hits = 0
+        self._index: Dict[str, Optional[int]] = {}
+        self._lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    async def refresh(self, batch_size: int = 10000) -> int:
+        """Load rows with id above the watermark; the first call loads everything."""
+        async with self._lock:
+            identifier_map = models.IdentifierMap
+            query = (
+                select(identifier_map.id, identifier_map.identifier, identifier_map.aid)
+                .where(identifier_map.id > self.watermark)
+                .order_by(identifier_map.id)
+            )
+            loaded = 0
+            async with SessionLocal() as db:
+                result = await db.stream(query)
+                async for rows in result.partitions(batch_size):
+                    for id_, identifier, aid in rows:
+                        self._index[identifier] = aid
+                    self.watermark = rows[-1][0]
+                    loaded += len(rows)
+            self.loaded = True
+            self.refreshed_at = time.monotonic()
+            return loaded
+
+    async def resolve_many(self, identifiers: Iterable[str]) -> Dict[str, Optional[int]]:
+        """Resolve identifiers to aids; unknown identifiers map to None."""
+        resolved = {}
+        missing = []
+        for identifier in dict.fromkeys(identifiers):
+            if identifier in self._index:
+                resolved[identifier] = self._index[identifier]
+                self.hits += 1
+            else:
+                missing.append(identifier)
+        if missing:
+            self.misses += len(missing)
+            fetched = await crud.get_identifier_maps(missing)
+            for identifier in missing:
+                row = fetched.get(identifier)
+                if row is not None:
+                    self._index[identifier] = row.aid
+                    self.fallback_hits += 1
+                resolved[identifier] = row.aid if row is not None else None
+        return resolved
+
+    async def resolve(self, identifier: str) -> Optional[int]:
+        return (await self.resolve_many([identifier]))[identifier]
+
+    async def _refresh_loop(self):
+        while True:
+            try:
+                loaded = await self.refresh()
+                if loaded:
+                    logger.info(f"Identifier index loaded {loaded} rows, watermark {self.watermark}")
+            except Exception as e:
+                logger.warning(f"Identifier index refresh failed: {str(e)}")
+            await asyncio.sleep(self.refresh_interval)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._refresh_loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._index),
+            "loaded": self.loaded,
+            "watermark": self.watermark,
+            "hits": self.hits,
+            "misses": self.misses,
+            "fallback_hits": self.fallback_hits,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "age": time.monotonic() - self.refreshed_at if self.loaded else None,
+        }
+
+
+resolver = IdentifierResolver()
@@ -0,0 +1,150 @@
+"""Incremental rollup of video_minute into daily video_dynamic snapshots.
+
+Each run reads the minute rows newer than the stored watermark, keeps the
+latest row per (aid, local day) and upserts it into video_dynamic. Run it
+once with `python -m app.rollup`, or set ROLLUP_INTERVAL to run it in the
+background of the API process. The etl_watermark table comes from
+migrations/0004.
+"""
+
+from sqlalchemy import select, func, literal_column, Date
+from sqlalchemy.dialects.postgresql import insert
+from datetime import datetime, timedelta, timezone
+from dotenv import load_dotenv
+from typing import Optional
+import asyncio
+import logging
+import time
+import os
+
+from . import bvid, crud, models, schemas, shared
+from .database import SessionLocal, engine
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+ROLLUP_NAME = "video_minute_to_dynamic"
+ROLLUP_TZ = os.getenv("ROLLUP_TZ", "Asia/Shanghai")
+ROLLUP_INTERVAL = float(os.getenv("ROLLUP_INTERVAL", "0"))  # seconds, 0 disables the background task
+ROLLUP_LAG = float(os.getenv("ROLLUP_LAG", "120"))  # leave room for rows still in flight
+ROLLUP_SPAN = float(os.getenv("ROLLUP_SPAN", "21600"))  # max seconds of minute data per step
+
+# unlisted: rows whose aid is not in video_static, so bvid was derived from the aid
+_stats = {"runs": 0, "rows": 0, "unlisted": 0, "last_run": None, "last_duration": None, "watermark": None}
+
+
+async def get_watermark() -> Optional[datetime]:
+    async with SessionLocal() as db:
+        watermark = await db.get(models.EtlWatermark, ROLLUP_NAME)
+        if watermark is not None:
+            return watermark.value
+        # First run: start just before the oldest minute row
+        oldest = await db.scalar(select(func.min(models.VideoMinute.time)))
+        return oldest - timedelta(microseconds=1) if oldest is not None else None
+
+
+async def set_watermark(value: datetime):
+    async with SessionLocal() as db:
+        stmt = insert(models.EtlWatermark).values(name=ROLLUP_NAME, value=value)
+        stmt = stmt.on_conflict_do_update(index_elements=["name"], set_={"value": value})
+        await db.execute(stmt)
+        await db.commit()
+
+
+async def latest_snapshots(since: datetime, until: datetime) -> list:
+    """Latest complete minute row per (aid, local day) in (since, until].
+
+    Aids missing from video_static are kept, with the bvid derived from the aid.
+    """
+    minute = models.VideoMinute
+    day = func.cast(func.timezone(ROLLUP_TZ, minute.time), Date).label("record_date")
+    query = (
+        select(day, minute.aid, models.VideoStatic.bvid, *[getattr(minute, metric) for metric in schemas.MINUTE_METRICS])
+        .outerjoin(models.VideoStatic, models.VideoStatic.aid == minute.aid)
+        .where(minute.time > since, minute.time <= until)
+        .where(*[getattr(minute, metric).isnot(None) for metric in schemas.MINUTE_METRICS])
+        .distinct(literal_column("record_date"), minute.aid)
+        .order_by(literal_column("record_date"), minute.aid, minute.time.desc())
+    )
+    async with SessionLocal() as db:
+        result = await db.execute(query)
+        snapshots = []
+        for row in result.mappings():
+            row = dict(row)
+            if row["bvid"] is None:
+                row["bvid"] = bvid.av2bv(row["aid"])
+                _stats["unlisted"] += 1
+            snapshots.append(schemas.VideoDynamicCreate(**row))
+        return snapshots
+
+
+async def next_minute_time(after: datetime) -> Optional[datetime]:
+    async with SessionLocal() as db:
+        return await db.scalar(
+            select(func.min(models.VideoMinute.time)).where(models.VideoMinute.time > after)
+        )
+
+
+async def run_once() -> int:
+    """Roll up everything between the watermark and now - ROLLUP_LAG."""
+    started = time.monotonic()
+    watermark = await get_watermark()
+    if watermark is None:
+        return 0
+    horizon = datetime.now(timezone.utc) - timedelta(seconds=ROLLUP_LAG)
+    rows = 0
+    while watermark < horizon:
+        until = min(horizon, watermark + timedelta(seconds=ROLLUP_SPAN))
+        snapshots = await latest_snapshots(watermark, until)
+        if snapshots:
+            # Later minutes of the same day overwrite the earlier snapshot
+            await crud.upsert_video_dynamic_bulk(snapshots, schemas.ConflictPolicy.update)
+        else:
+            # Skip gaps in the minute data instead of stepping through them
+            following = await next_minute_time(until)
+            if following is None or following > horizon:
+                until = horizon
+            elif following - timedelta(microseconds=1) > until:
+                until = following - timedelta(microseconds=1)
+        await set_watermark(until)
+        rows += len(snapshots)
+        watermark = until
+    _stats.update(
+        runs=_stats["runs"] + 1,
+        rows=_stats["rows"] + rows,
+        last_run=datetime.now(timezone.utc).isoformat(),
+        last_duration=time.monotonic() - started,
+        watermark=watermark.isoformat(),
+    )
+    return rows
+
+
+async def run_forever(interval: float = ROLLUP_INTERVAL):
+    while True:
+        try:
+            # With several workers only the lease holder rolls up
+            if await shared.lease("rollup", interval * 3):
+                rows = await run_once()
+                if rows:
+                    logger.info(f"Rollup wrote {rows} video_dynamic rows")
+        except Exception as e:
+            logger.error(f"Rollup failed: {str(e)}")
+        await asyncio.sleep(interval)
+
+
+def stats() -> dict:
+    return dict(_stats)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+
+    async def main():
+        try:
+            rows = await run_once()
+            logger.info(f"Rollup wrote {rows} video_dynamic rows, watermark {_stats['watermark']}")
+        finally:
+            await engine.dispose()
+
+    asyncio.run(main())
@@ -1,6 +1,7 @@
 from pydantic import BaseModel, field_validator
-from typing import Optional, Any
+from typing import Optional, Any, Dict, List
 from datetime import date, datetime, timezone
+from enum import Enum
 
 class VideoStaticBase(BaseModel):
     aid: int
@@ -27,6 +28,17 @@ class VideoStatic(VideoStaticBase):
     class Config:
         from_attributes = True
 
+class VideoStaticRequest(BaseModel):
+    avid: int = 0
+    bv: str = ""
+    priority: int = 0
+
+class VideoStaticStatus(BaseModel):
+    avid: int
+    bv: str
+    status: str  # "exists", "inserted", "updated" (on_conflict=update) or "error"
+    message: Optional[str] = None
+
 class VideoDynamicBase(BaseModel):
     record_date: date
     aid: int
@@ -65,14 +77,133 @@ class VideoMinuteCreate(VideoMinuteBase):
             return datetime.fromtimestamp(v, tz=timezone.utc)
         return v
 
+# Counter columns of a minute row, in table order
+MINUTE_METRICS = [name for name in VideoMinuteBase.model_fields if name not in ("time", "aid")]
+
+
+def epoch(value) -> float:
+    """Unix seconds of an aware datetime; numbers pass through."""
+    if isinstance(value, datetime):
+        return value.timestamp()
+    return float(value)
+
+
 class VideoMinute(VideoMinuteBase):
     class Config:
         from_attributes = True
 
+class BulkIngestResult(BaseModel):
+    total: int
+    inserted: int
+    duplicates: int
+
+class IngestChunkResult(BulkIngestResult):
+    chunk: int
+    invalid: int = 0
+    errors: List[str] = []  # first few "line N: ..." messages
+
+class StreamIngestResult(BaseModel):
+    total: int
+    inserted: int
+    duplicates: int
+    invalid: int
+    chunks: List[IngestChunkResult]
+
+class DimType(BaseModel):
+    type_id: int
+    name: str
+
+    class Config:
+        from_attributes = True
+
+class DimUser(BaseModel):
+    user_id: int
+    name: str
+    face: Optional[str] = None
+
+    class Config:
+        from_attributes = True
+
+class IdentifierMap(BaseModel):
+    id: int
+    identifier: str
+    aid: Optional[int] = None
+    stat: Optional[int] = None
+
+    class Config:
+        from_attributes = True
+
+class VideoDetail(VideoStaticBase):
+    user_name: Optional[str] = None
+    user_face: Optional[str] = None
+    type_name: Optional[str] = None
+    vocal_ids: List[int] = []
+
+class LeaderboardEntry(BaseModel):
+    aid: int
+    time: datetime  # latest minute row
+    since: datetime  # row the delta is measured from
+    value: int
+    delta: int
+
+class ConflictPolicy(str, Enum):
+    ignore = "ignore"  # ON CONFLICT DO NOTHING
+    update = "update"  # ON CONFLICT DO UPDATE
+
+class UpsertResult(BaseModel):
+    inserted: List[Dict[str, Any]]
+    updated: List[Dict[str, Any]]
+    skipped: List[Dict[str, Any]]
+
+class StreamUpsertResult(UpsertResult):
+    invalid: int
+    errors: List[str] = []  # first few "line N: ..." messages per chunk
+
 class SuccessResponse(BaseModel):
     result: Any
     time: float
     status: str
+    timing: Optional[Dict[str, float]] = None  # db_ms, upstream_ms, serialize_ms
+
+class PageResponse(SuccessResponse):
+    next_cursor: Optional[int] = None
+
+# Typed envelopes, serialized directly instead of through `result: Any`
+class VideoStaticPageResponse(PageResponse):
+    result: List[VideoStatic]
+
+class VideoStaticStatusResponse(SuccessResponse):
+    result: List[VideoStaticStatus]
+
+class VideoDetailResponse(SuccessResponse):
+    result: Dict[int, VideoDetail]
+
+class VideoMinuteSeriesResponse(SuccessResponse):
+    result: Dict[int, Dict[str, List[Optional[int]]]]
+
+class DimUserResponse(SuccessResponse):
+    result: Dict[int, Optional[DimUser]]
+
+class DimTypeResponse(SuccessResponse):
+    result: Dict[int, Optional[DimType]]
+
+class IdentifierMapResponse(SuccessResponse):
+    result: Dict[str, Optional[IdentifierMap]]
+
+class VideoVocalsResponse(SuccessResponse):
+    result: Dict[int, List[int]]
+
+class ResolveResponse(SuccessResponse):
+    result: Dict[str, Optional[int]]
+
+class LeaderboardResponse(SuccessResponse):
+    result: List[LeaderboardEntry]
+
+class StreamIngestResponse(SuccessResponse):
+    result: StreamIngestResult
+
+class StreamUpsertResponse(SuccessResponse):
+    result: StreamUpsertResult
 
 class ErrorResponse(BaseModel):
     status: str
@@ -0,0 +1,362 @@
+"""State shared between the worker processes of one deployment.
+
+With WEB_CONCURRENCY > 1 uvicorn runs several copies of the app, each with
+its own memory. What must stay global goes through a small key-value store
+selected by SHARED_STATE_URL:
+
+    memory://                    this process only (the default with one worker)
+    sqlite:///path/to/file.db    workers on one host (the default with several)
+    redis://host:6379/0          any number of hosts; needs the `redis` package
+
+It holds the WBI signing keys, generation counters that invalidate the
+per-worker caches, the token bucket pacing upstream Bilibili calls, and
+leases that keep periodic jobs (rollup, video_growth persist, minute
+retention, video_static refresh) on one worker.
+Store errors are logged and degrade to per-process behaviour rather than
+failing requests.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from dotenv import load_dotenv
+from typing import Dict, Optional
+import asyncio
+import logging
+import sqlite3
+import tempfile
+import socket
+import time
+import uuid
+import os
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", "1"))
+SHARED_STATE_URL = os.getenv("SHARED_STATE_URL") or (
+    f"sqlite:///{os.path.join(tempfile.gettempdir(), 'hantang-shared.db')}" if WEB_CONCURRENCY > 1 else "memory://"
+)
+SHARED_SYNC_INTERVAL = float(os.getenv("SHARED_SYNC_INTERVAL", "1"))  # seconds between cache generation checks
+
+# Identifies this process as a lease holder
+OWNER = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+def bucket_take(tokens: Optional[float], updated: Optional[float], now: float, rate: float, burst: int) -> tuple:
+    """Reserve one token; returns (tokens, delay). Tokens may go negative:
+    the caller waits `delay` seconds for the token it was handed."""
+    if tokens is None:
+        tokens, updated = float(burst), now
+    tokens = min(burst, tokens + max(now - updated, 0) * rate) - 1
+    return tokens, -tokens / rate if tokens < 0 else 0.0
+
+
+class MemoryStore:
+    """Process-local store; the semantics of the shared ones without sharing."""
+
+    scheme = "memory"
+
+    def __init__(self):
+        self._data: Dict[str, tuple] = {}  # key -> (value, expires or None)
+
+    def _get(self, key: str):
+        entry = self._data.get(key)
+        if entry is None or (entry[1] is not None and entry[1] <= time.time()):
+            return None
+        return entry[0]
+
+    async def get(self, key: str) -> Optional[str]:
+        return self._get(key)
+
+    async def set(self, key: str, value: str, ttl: Optional[float] = None):
+        self._data[key] = (value, time.time() + ttl if ttl else None)
+
+    async def incr(self, key: str) -> int:
+        value = int(self._get(key) or 0) + 1
+        self._data[key] = (str(value), None)
+        return value
+
+    async def take(self, key: str, rate: float, burst: int) -> float:
+        state = self._get(key)
+        now = time.time()
+        tokens, delay = bucket_take(*(state or (None, None)), now, rate, burst)
+        self._data[key] = ((tokens, now), None)
+        return delay
+
+    async def lease(self, key: str, owner: str, ttl: float) -> bool:
+        holder = self._get(key)
+        if holder is not None and holder != owner:
+            return False
+        await self.set(key, owner, ttl)
+        return True
+
+    async def close(self):
+        pass
+
+
+class SQLiteStore:
+    """Store in a SQLite file, for workers on the same host.
+
+    Calls run on one dedicated thread; read-modify-write operations take the
+    database write lock (BEGIN IMMEDIATE) so they are atomic across processes.
+    """
+
+    scheme = "sqlite"
+
+    def __init__(self, path: str):
+        self.path = path
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="shared-sqlite")
+        self._conn: Optional[sqlite3.Connection] = None
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS shared_state (key TEXT PRIMARY KEY, value TEXT, expires REAL)"
+            )
+            self._conn = conn
+        return self._conn
+
+    async def _run(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+
+    def _select(self, conn: sqlite3.Connection, key: str, now: float) -> Optional[str]:
+        row = conn.execute(
+            "SELECT value FROM shared_state WHERE key = ? AND (expires IS NULL OR expires > ?)", (key, now)
+        ).fetchone()
+        return row[0] if row else None
+
+    def _upsert(self, conn: sqlite3.Connection, key: str, value: str, expires: Optional[float]):
+        conn.execute(
+            "INSERT INTO shared_state (key, value, expires) VALUES (?, ?, ?) "
+            "ON CONFLICT (key) DO UPDATE SET value = excluded.value, expires = excluded.expires",
+            (key, value, expires),
+        )
+
+    def _atomic(self, fn, *args):
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            result = fn(conn, time.time(), *args)
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+        return result
+
+    async def get(self, key: str) -> Optional[str]:
+        return await self._run(lambda: self._select(self._connect(), key, time.time()))
+
+    async def set(self, key: str, value: str, ttl: Optional[float] = None):
+        await self._run(lambda: self._upsert(self._connect(), key, value, time.time() + ttl if ttl else None))
+
+    async def incr(self, key: str) -> int:
+        def incr(conn, now):
+            value = int(self._select(conn, key, now) or 0) + 1
+            self._upsert(conn, key, str(value), None)
+            return value
+        return await self._run(self._atomic, incr)
+
+    async def take(self, key: str, rate: float, burst: int) -> float:
+        def take(conn, now):
+            state = self._select(conn, key, now)
+            tokens, updated = map(float, state.split(",")) if state else (None, None)
+            tokens, delay = bucket_take(tokens, updated, now, rate, burst)
+            self._upsert(conn, key, f"{tokens},{now}", None)
+            return delay
+        return await self._run(self._atomic, take)
+
+    async def lease(self, key: str, owner: str, ttl: float) -> bool:
+        def lease(conn, now):
+            holder = self._select(conn, key, now)
+            if holder is not None and holder != owner:
+                return False
+            self._upsert(conn, key, owner, now + ttl)
+            return True
+        return await self._run(self._atomic, lease)
+
+    async def close(self):
+        def close():
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+        await self._run(close)
+
+
+# KEYS[1] bucket; ARGV rate, burst. Uses the server clock so hosts agree.
+TAKE_SCRIPT = """
+local rate, burst = tonumber(ARGV[1]), tonumber(ARGV[2])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+local tokens, updated = tonumber(state[1]) or burst, tonumber(state[2]) or now
+tokens = math.min(burst, tokens + math.max(now - updated, 0) * rate) - 1
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated', tostring(now))
+redis.call('PEXPIRE', KEYS[1], math.ceil((burst - tokens) / rate * 1000) + 1000)
+if tokens >= 0 then return '0' end
+return tostring(-tokens / rate)
+"""
+
+# KEYS[1] lease; ARGV owner, ttl in milliseconds
+LEASE_SCRIPT = """
+local holder = redis.call('GET', KEYS[1])
+if holder and holder ~= ARGV[1] then return 0 end
+redis.call('SET', KEYS[1], ARGV[1], 'PX', ARGV[2])
+return 1
+"""
+
+
+class RedisStore:
+    """Store on a Redis-compatible server (Redis, Valkey, KeyDB, ...)."""
+
+    scheme = "redis"
+
+    def __init__(self, url: str, prefix: str = "hantang:"):
+        try:
+            import redis.asyncio
+        except ImportError:
+            raise RuntimeError(f"SHARED_STATE_URL={url!r} needs the redis package (pdm install -G redis)")
+        self.prefix = prefix
+        self._redis = redis.asyncio.from_url(url, decode_responses=True)
+        self._take = self._redis.register_script(TAKE_SCRIPT)
+        self._lease = self._redis.register_script(LEASE_SCRIPT)
+
+    async def get(self, key: str) -> Optional[str]:
+        return await self._redis.get(self.prefix + key)
+
+    async def set(self, key: str, value: str, ttl: Optional[float] = None):
+        await self._redis.set(self.prefix + key, value, px=int(ttl * 1000) if ttl else None)
+
+    async def incr(self, key: str) -> int:
+        return await self._redis.incr(self.prefix + key)
+
+    async def take(self, key: str, rate: float, burst: int) -> float:
+        return float(await self._take(keys=[self.prefix + key], args=[rate, burst]))
+
+    async def lease(self, key: str, owner: str, ttl: float) -> bool:
+        return bool(await self._lease(keys=[self.prefix + key], args=[owner, int(ttl * 1000)]))
+
+    async def close(self):
+        await self._redis.aclose()
+
+
+def open_store(url: str):
+    if url.startswith("memory://"):
+        return MemoryStore()
+    if url.startswith("sqlite:///"):
+        return SQLiteStore(url[len("sqlite:///"):])
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisStore(url)
+    raise ValueError(f"Unsupported SHARED_STATE_URL: {url!r}")
+
+
+store = open_store(SHARED_STATE_URL)
+errors = 0
+
+# Per-worker caches kept coherent through generation counters: name -> cache
+_caches: Dict[str, object] = {}
+_generations: Dict[str, int] = {}
+_task: Optional[asyncio.Task] = None
+
+
+def failed(op: str, e: Exception):
+    global errors
+    errors += 1
+    logger.warning(f"Shared state {op} failed: {str(e)}")
+
+
+def register_cache(name: str, cache):
+    """Clear `cache` in every worker whenever one of them calls invalidate(name)."""
+    _caches[name] = cache
+
+
+async def invalidate(name: str):
+    """Clear the named cache here right away and in the other workers within
+    SHARED_SYNC_INTERVAL."""
+    if name in _caches:
+        _caches[name].clear()
+    try:
+        _generations[name] = await store.incr(f"generation:{name}")
+    except Exception as e:
+        failed("invalidate", e)
+
+
+async def sync_caches():
+    for name, cache in _caches.items():
+        generation = int(await store.get(f"generation:{name}") or 0)
+        if _generations.setdefault(name, generation) != generation:
+            _generations[name] = generation
+            cache.clear()
+
+
+async def _syncLoop():
+    while True:
+        try:
+            await sync_caches()
+        except Exception as e:
+            failed("cache sync", e)
+        await asyncio.sleep(SHARED_SYNC_INTERVAL)
+
+
+async def lease(name: str, ttl: float) -> bool:
+    """Whether this worker holds (or just took) the lease on `name` for `ttl`
+    seconds. Holders renew by calling again before it expires."""
+    try:
+        return await store.lease(f"lease:{name}", OWNER, ttl)
+    except Exception as e:
+        failed("lease", e)
+        return False
+
+
+class SharedRateLimiter:
+    """Token bucket shared by all workers, with the interface of
+    client.RateLimiter; paces this process alone if the store fails."""
+
+    def __init__(self, name: str, rate: float, burst: int, fallback):
+        self.key = f"bucket:{name}"
+        self.rate = rate
+        self.burst = max(burst, 1)
+        self.waited = 0.0
+        self.fallback = fallback
+
+    async def acquire(self):
+        if self.rate <= 0:
+            return
+        try:
+            delay = await store.take(self.key, self.rate, self.burst)
+        except Exception as e:
+            failed("rate limit", e)
+            return await self.fallback.acquire()
+        if delay > 0:
+            self.waited += delay
+            await asyncio.sleep(delay)
+
+
+def start():
+    global _task
+    if _task is None and store.scheme != "memory":
+        _task = asyncio.create_task(_syncLoop())
+
+
+async def stop():
+    global _task
+    if _task is not None:
+        _task.cancel()
+        try:
+            await _task
+        except asyncio.CancelledError:
+            pass
+        _task = None
+    await store.close()
+
+
+def stats() -> dict:
+    return {
+        "backend": store.scheme,
+        "workers": WEB_CONCURRENCY,
+        "owner": OWNER,
+        "caches": dict(_generations),
+        "errors": errors,
+    }
@@ -1,8 +1,17 @@
-from functools import reduce
 from hashlib import md5
+from typing import Optional
 import urllib.parse
+import asyncio
+import logging
+import json
 import time
-import requests
+import os
+from . import client, shared
+
+logger = logging.getLogger(__name__)
+
+# img_key/sub_key 每天轮换, 默认每小时刷新一次
+WBI_KEY_TTL = float(os.getenv("WBI_KEY_TTL", "3600"))
 
 mixinKeyEncTab = [
     46, 47, 18, 2, 53, 8, 23, 32, 15, 50, 10, 31, 58, 3, 45, 35, 27, 43, 5, 49,
@@ -13,18 +22,17 @@ mixinKeyEncTab = [
 
 def getMixinKey(orig: str):
     '对 imgKey 和 subKey 进行字符顺序打乱编码'
-    return reduce(lambda s, i: s + orig[i], mixinKeyEncTab, '')[:32]
+    return ''.join(orig[i] for i in mixinKeyEncTab[:32])
 
-def encWbi(params: dict, img_key: str, sub_key: str):
-    '为请求参数进行 wbi 签名'
-    mixin_key = getMixinKey(img_key + sub_key)
+def signWbi(params: dict, mixin_key: str):
+    '使用已计算好的 mixin_key 为请求参数进行 wbi 签名'
     curr_time = round(time.time())
     params['wts'] = curr_time                                   # 添加 wts 字段
     params = dict(sorted(params.items()))                       # 按照 key 重排参数
     # 过滤 value 中的 "!'()*" 字符
     params = {
         k : ''.join(filter(lambda chr: chr not in "!'()*", str(v)))
-        for k, v 
+        for k, v
         in params.items()
     }
     query = urllib.parse.urlencode(params)                      # 序列化参数
@@ -32,19 +40,146 @@ def encWbi(params: dict, img_key: str, sub_key: str):
     params['w_rid'] = wbi_sign
     return params
 
-def getWbiKeys() -> tuple[str, str]:
+def encWbi(params: dict, img_key: str, sub_key: str):
+    '为请求参数进行 wbi 签名'
+    return signWbi(params, getMixinKey(img_key + sub_key))
+
+async def getWbiKeys() -> tuple[str, str]:
     '获取最新的 img_key 和 sub_key'
-    headers = {
-        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/131.0.0.0 Safari/537.36',
-        'Referer': 'https://www.bilibili.com/'
-    }
-    resp = requests.get('https://api.bilibili.com/x/web-interface/nav', headers=headers)
-    resp.raise_for_status()
-    json_content = resp.json()
+    json_content = await client.get_json('/x/web-interface/nav')
     img_url: str = json_content['data']['wbi_img']['img_url']
     sub_url: str = json_content['data']['wbi_img']['sub_url']
     img_key = img_url.rsplit('/', 1)[1].split('.')[0]
     sub_key = sub_url.rsplit('/', 1)[1].split('.')[0]
     return img_key, sub_key
 
-img_key, sub_key = getWbiKeys()
+
+class WbiKeyManager:
+    '缓存 img_key/sub_key 及 mixin_key, 过期或签名失败时单飞刷新'
+
+    def __init__(self, ttl: float = WBI_KEY_TTL):
+        self.ttl = ttl
+        self.img_key: Optional[str] = None
+        self.sub_key: Optional[str] = None
+        self.mixin_key: Optional[str] = None
+        self.fetched_at = 0.0                                   # time.monotonic()
+        self.hits = 0
+        self.misses = 0
+        self.refreshes = 0
+        self.failures = 0
+        self.adopted = 0                                        # 从共享存储取得(其他 worker 刷新)的次数
+        self.last_error: Optional[str] = None                   # 最近一次刷新失败的原因, 成功后清空
+        self._lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    def fresh(self) -> bool:
+        return self.mixin_key is not None and time.monotonic() - self.fetched_at < self.ttl
+
+    async def getMixinKey(self) -> str:
+        '返回缓存的 mixin_key, 过期时刷新'
+        if self.fresh():
+            self.hits += 1
+            return self.mixin_key
+        self.misses += 1
+        await self.refresh(self.fetched_at)
+        return self.mixin_key
+
+    async def refresh(self, seen: Optional[float] = None):
+        '''单飞刷新: 等锁期间若已有其他协程完成刷新则直接返回
+
+        seen 是调用方看到的 fetched_at, 用来判断等锁时 key 是否已被换过
+        '''
+        if seen is None:
+            seen = self.fetched_at
+        async with self._lock:
+            if self.fetched_at != seen and self.mixin_key is not None:
+                return
+            if await self._adoptShared():
+                return
+            if not await shared.lease("wbi-refresh", 10):
+                # 另一个 worker 正在刷新, 稍等后采用它的结果, 等不到再自己请求
+                for _ in range(20):
+                    await asyncio.sleep(0.25)
+                    if await self._adoptShared():
+                        return
+            try:
+                img_key, sub_key = await getWbiKeys()
+            except Exception as e:
+                self.failures += 1
+                self.last_error = f"{type(e).__name__}: {e}"
+                raise
+            self.img_key, self.sub_key = img_key, sub_key
+            self.mixin_key = getMixinKey(img_key + sub_key)
+            self.fetched_at = time.monotonic()
+            self.refreshes += 1
+            self.last_error = None
+            try:
+                value = json.dumps({"img_key": img_key, "sub_key": sub_key, "fetched": time.time()})
+                await shared.store.set("wbi:keys", value, self.ttl)
+            except Exception as e:
+                shared.failed("WBI key publish", e)
+
+    async def _adoptShared(self) -> bool:
+        '采用其他 worker 刚刷新并写入共享存储的 key; 与当前 key 相同(正要替换的)则不采用'
+        try:
+            value = await shared.store.get("wbi:keys")
+        except Exception as e:
+            shared.failed("WBI key lookup", e)
+            return False
+        if value is None:
+            return False
+        value = json.loads(value)
+        mixin_key = getMixinKey(value["img_key"] + value["sub_key"])
+        if mixin_key == self.mixin_key:
+            return False
+        self.img_key, self.sub_key = value["img_key"], value["sub_key"]
+        self.mixin_key = mixin_key
+        self.fetched_at = time.monotonic() - max(time.time() - value["fetched"], 0)
+        self.adopted += 1
+        self.last_error = None
+        return True
+
+    async def sign(self, params: dict) -> dict:
+        '使用缓存的 key 为请求参数签名'
+        return signWbi(params, await self.getMixinKey())
+
+    async def _refreshLoop(self):
+        while True:
+            # 启动时还没有 key 则立即在后台预取, 不阻塞启动
+            if self.mixin_key is not None:
+                await asyncio.sleep(max(self.ttl - (time.monotonic() - self.fetched_at), 1))
+            try:
+                await self.refresh()
+            except Exception as e:
+                logger.warning(f"WBI key refresh failed: {str(e)}")
+                await asyncio.sleep(min(self.ttl, 60))
+
+    def start(self):
+        '启动后台预取及定时刷新'
+        if self._task is None:
+            self._task = asyncio.create_task(self._refreshLoop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "refreshes": self.refreshes,
+            "failures": self.failures,
+            "adopted": self.adopted,
+            "key_age": time.monotonic() - self.fetched_at if self.mixin_key else None,
+            "last_error": self.last_error,
+        }
+
+
+keys = WbiKeyManager()
@@ -0,0 +1,157 @@
+from dotenv import load_dotenv
+from typing import Awaitable, Callable, List, Optional
+import asyncio
+import logging
+import time
+import os
+
+from . import crud
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+MINUTE_WRITE_BEHIND = os.getenv("MINUTE_WRITE_BEHIND", "false").lower() in ("1", "true", "yes")
+MINUTE_QUEUE_SIZE = int(os.getenv("MINUTE_QUEUE_SIZE", "10000"))
+MINUTE_FLUSH_ROWS = int(os.getenv("MINUTE_FLUSH_ROWS", "1000"))
+MINUTE_FLUSH_INTERVAL = float(os.getenv("MINUTE_FLUSH_INTERVAL", "1"))  # seconds
+MINUTE_FLUSH_RETRIES = int(os.getenv("MINUTE_FLUSH_RETRIES", "5"))  # retries of a failed batch before dropping it
+MINUTE_FLUSH_BACKOFF = float(os.getenv("MINUTE_FLUSH_BACKOFF", "0.5"))  # seconds before the first retry, doubling
+MINUTE_FLUSH_BACKOFF_MAX = 30.0
+
+_STOP = object()
+
+
+class WriteBehindQueue:
+    """Bounded in-process queue drained by a flusher that writes rows in batches.
+
+    A batch is flushed once it reaches `batch_size` rows or `interval` seconds
+    after its first row arrived, whichever comes first. A failed flush is
+    retried `retries` times with exponential backoff, so `flush` must be
+    idempotent; meanwhile the queue fills up and put() pushes back. Only then
+    is the batch dropped and counted as failed.
+    """
+
+    def __init__(
+        self,
+        flush: Callable[[List], Awaitable],
+        maxsize: int,
+        batch_size: int,
+        interval: float,
+        retries: int = MINUTE_FLUSH_RETRIES,
+        backoff: float = MINUTE_FLUSH_BACKOFF,
+    ):
+        self.flush = flush
+        self.batch_size = batch_size
+        self.interval = interval
+        self.retries = retries
+        self.backoff = backoff
+        self.enqueued = 0
+        self.rejected = 0
+        self.flushed = 0
+        self.failed = 0
+        self.retried = 0
+        self.flushes = 0
+        self.flush_time_total = 0.0
+        self.flush_time_max = 0.0
+        self.last_flush_time = 0.0
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize)
+        self._task: Optional[asyncio.Task] = None
+
+    def put(self, item) -> bool:
+        """Enqueue without waiting; False means the queue is full."""
+        try:
+            self._queue.put_nowait(item)
+        except asyncio.QueueFull:
+            self.rejected += 1
+            return False
+        self.enqueued += 1
+        return True
+
+    async def _write(self, batch: List):
+        start = time.perf_counter()
+        delay = self.backoff
+        try:
+            for attempt in range(self.retries + 1):
+                try:
+                    await self.flush(batch)
+                    self.flushed += len(batch)
+                    return
+                except Exception as e:
+                    if attempt == self.retries:
+                        self.failed += len(batch)
+                        logger.error(f"Write-behind flush of {len(batch)} rows failed, dropping them: {str(e)}")
+                        return
+                    self.retried += 1
+                    logger.warning(f"Write-behind flush of {len(batch)} rows failed, retrying in {delay:g}s: {str(e)}")
+                    await asyncio.sleep(delay)
+                    delay = min(delay * 2, MINUTE_FLUSH_BACKOFF_MAX)
+        finally:
+            elapsed = time.perf_counter() - start
+            self.flushes += 1
+            self.flush_time_total += elapsed
+            self.flush_time_max = max(self.flush_time_max, elapsed)
+            self.last_flush_time = elapsed
+
+    async def _run(self):
+        while True:
+            item = await self._queue.get()
+            if item is _STOP:
+                return
+            batch = [item]
+            deadline = time.monotonic() + self.interval
+            stopping = False
+            while len(batch) < self.batch_size:
+                try:
+                    item = self._queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    try:
+                        item = await asyncio.wait_for(self._queue.get(), remaining)
+                    except asyncio.TimeoutError:
+                        break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+            await self._write(batch)
+            if stopping:
+                return
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Flush everything enqueued so far, then stop the flusher."""
+        if self._task is None:
+            return
+        await self._queue.put(_STOP)
+        await self._task
+        self._task = None
+
+    def stats(self) -> dict:
+        return {
+            "depth": self._queue.qsize(),
+            "maxsize": self._queue.maxsize,
+            "enqueued": self.enqueued,
+            "rejected": self.rejected,
+            "flushed": self.flushed,
+            "failed": self.failed,
+            "retried": self.retried,
+            "flushes": self.flushes,
+            "flush_time_avg": self.flush_time_total / self.flushes if self.flushes else 0.0,
+            "flush_time_max": self.flush_time_max,
+            "flush_time_last": self.last_flush_time,
+        }
+
+
+# Rows go through the COPY ingest path, so duplicates are skipped at flush time
+minute_queue = WriteBehindQueue(
+    crud.add_video_minute_bulk,
+    MINUTE_QUEUE_SIZE,
+    MINUTE_FLUSH_ROWS,
+    MINUTE_FLUSH_INTERVAL,
+)
@@ -0,0 +1,101 @@
+"""Time a cold `import app.main`, and optionally the boot until uvicorn answers.
+
+    python -m bench.coldstart --runs 10
+    python -m bench.coldstart --runs 5 --serve --top 15
+
+Each run is a fresh interpreter, so nothing is shared between runs except
+the OS page cache. BILIBILI_API_BASE and the PG_* host point at addresses
+that never answer (override with --upstream / --pg-host): importing the app
+and binding the server must not wait on either. --serve also starts uvicorn
+and measures until `GET /` responds. --top prints the slowest modules from
+`python -X importtime` for the last run.
+"""
+from typing import List
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+import httpx
+
+# TEST-NET-1 (RFC 5737): routable nowhere, connects hang until they time out
+BLACKHOLE = "192.0.2.1"
+
+
+def import_time(env: dict, importtime: bool = False) -> tuple:
+    args = [sys.executable, *(["-X", "importtime"] if importtime else []), "-c", "import app.main"]
+    start = time.perf_counter()
+    result = subprocess.run(args, env=env, capture_output=True, text=True)
+    elapsed = time.perf_counter() - start
+    if result.returncode:
+        raise SystemExit(f"import app.main failed:\n{result.stderr}")
+    return elapsed, result.stderr
+
+
+def serve_time(env: dict, port: int, timeout: float = 60) -> float:
+    start = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        while True:
+            try:
+                httpx.get(f"http://127.0.0.1:{port}/", timeout=1).raise_for_status()
+                return time.perf_counter() - start
+            except httpx.HTTPError:
+                if server.poll() is not None:
+                    raise SystemExit("uvicorn exited during startup")
+                if time.perf_counter() - start > timeout:
+                    raise
+                time.sleep(0.01)
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def slowest_imports(stderr: str, top: int) -> List[tuple]:
+    """Parse `-X importtime` output into (cumulative µs, module), slowest first."""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, module = line[len("import time:"):].split("|")
+        rows.append((int(cumulative), module.rstrip()))
+    return sorted(rows, reverse=True)[:top]
+
+
+def summary(label: str, samples: List[float]):
+    print(
+        f"{label:<8} min {min(samples) * 1000:>8.1f}  median {statistics.median(samples) * 1000:>8.1f}  "
+        f"max {max(samples) * 1000:>8.1f} ms  ({len(samples)} runs)"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--serve", action="store_true", help="also time uvicorn until GET / answers")
+    parser.add_argument("--port", type=int, default=8767)
+    parser.add_argument("--upstream", default=f"http://{BLACKHOLE}", help="BILIBILI_API_BASE for the runs")
+    parser.add_argument("--pg-host", default=BLACKHOLE, help="PG_HOST for the runs")
+    parser.add_argument("--top", type=int, default=0, help="show the N slowest imports")
+    args = parser.parse_args()
+
+    env = {**os.environ, "BILIBILI_API_BASE": args.upstream, "PG_HOST": args.pg_host}
+    imports = [import_time(env)[0] for _ in range(args.runs)]
+    summary("import", imports)
+    if args.serve:
+        summary("serve", [serve_time(env, args.port) for _ in range(args.runs)])
+    if args.top:
+        _, stderr = import_time(env, importtime=True)
+        for cumulative, module in slowest_imports(stderr, args.top):
+            print(f"{cumulative / 1000:>10.1f} ms  {module}")
+
+
+if __name__ == "__main__":
+    main()
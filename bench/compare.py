@@ -0,0 +1,41 @@
+"""Compare two bench.load result files.
+
+    python -m bench.compare bench/results/old.json bench/results/new.json
+
+Prints throughput and p50/p99 per scenario with the relative change.
+"""
+import argparse
+import json
+
+FIELDS = ["rps", "p50_ms", "p99_ms"]
+
+
+def change(old: float, new: float) -> str:
+    return f"{(new - old) / old * 100:+.1f}%" if old else "n/a"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("old")
+    parser.add_argument("new")
+    args = parser.parse_args()
+    with open(args.old) as f:
+        old = json.load(f)
+    with open(args.new) as f:
+        new = json.load(f)
+
+    print(f"{'':<26} {old['commit']:>16} {new['commit']:>16}")
+    for name, result in new["results"].items():
+        before = old["results"].get(name)
+        if before is None:
+            continue
+        for field in FIELDS:
+            label = name if field == FIELDS[0] else ""
+            print(
+                f"{label:<18} {field:<7} {before[field]:>16.2f} {result[field]:>16.2f}"
+                f"  {change(before[field], result[field]):>8}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+"""Check that the hot crud queries are planned with the expected indexes.
+
+    python -m app.migrate && python -m bench.seed    # indexes and data first
+    python -m bench.explain
+
+Each case calls the real crud function, captures the SQL it sends, and runs
+EXPLAIN (FORMAT JSON) on it with the same parameters. A case fails when the
+expected index is missing from the plan or its table is read by a Seq Scan
+(on partitioned tables: any partition's copy of the index, any partition).
+On a small database the planner may rightly prefer sequential scans; pass
+--no-seqscan to check only that the indexes are usable. Exits 1 on failure.
+"""
+from datetime import date, datetime, timedelta, timezone
+from typing import Awaitable, Callable, Dict, List, Tuple
+import argparse
+import asyncio
+import json
+import sys
+
+from sqlalchemy import event
+
+from app import crud
+from app.database import SessionLocal, engine
+from app.refresh import static_refresh
+
+from .seed import FIRST_AID
+
+NOW = datetime.now(timezone.utc)
+
+
+async def refresh_pick():
+    async with SessionLocal() as db:
+        return await static_refresh.pick(db)
+
+
+# name -> (crud call, table, expected index)
+CASES: Dict[str, Tuple[Callable[[], Awaitable], str, str]] = {
+    "get_video_static": (lambda: crud.get_video_static(FIRST_AID), "video_static", "video_static_pkey"),
+    "get_video_static_bulk": (
+        lambda: crud.get_video_static_bulk(list(range(FIRST_AID, FIRST_AID + 50))),
+        "video_static", "video_static_pkey",
+    ),
+    "get_video_static_by_priority(all)": (
+        lambda: crud.get_video_static_by_priority(0, FIRST_AID, 1000),
+        "video_static", "ix_video_static_priority",
+    ),
+    "get_video_static_by_priority(2)": (
+        lambda: crud.get_video_static_by_priority(2, FIRST_AID, 1000),
+        "video_static", "ix_video_static_priority",
+    ),
+    "get_video_minute": (lambda: crud.get_video_minute(FIRST_AID, 0), "video_minute", "ix_video_minute_aid_time"),
+    "get_video_minute_series": (
+        lambda: crud.get_video_minute_series(
+            list(range(FIRST_AID, FIRST_AID + 10)), NOW - timedelta(days=1), NOW, 3600
+        ),
+        "video_minute", "ix_video_minute_aid_time",
+    ),
+    "get_video_dynamic": (
+        lambda: crud.get_video_dynamic(FIRST_AID, date.today()), "video_dynamic", "video_dynamic_pkey"
+    ),
+    "get_identifier_map": (
+        lambda: crud.get_identifier_map("seed"), "identifier_map", "ix_identifier_map_identifier"
+    ),
+    "get_identifier_maps": (
+        lambda: crud.get_identifier_maps(["seed", "other"]), "identifier_map", "ix_identifier_map_identifier"
+    ),
+    "get_video_vocals": (
+        lambda: crud.get_video_vocals(FIRST_AID), "olap_rel_video_vocal", "olap_rel_video_vocal_pkey"
+    ),
+    "get_video_details": (
+        lambda: crud.get_video_details(list(range(FIRST_AID, FIRST_AID + 50))),
+        "video_static", "video_static_pkey",
+    ),
+    "static_refresh.pick": (refresh_pick, "video_static", "ix_video_static_refresh"),
+}
+
+
+def scans(plan: dict) -> List[Tuple[str, str, str]]:
+    """(node type, table, index) of every scan node in a JSON plan."""
+    found = []
+    if "Relation Name" in plan or "Index Name" in plan:
+        found.append((plan["Node Type"], plan.get("Relation Name", ""), plan.get("Index Name", "")))
+    for child in plan.get("Plans", []):
+        found.extend(scans(child))
+    return found
+
+
+async def capture(call: Callable[[], Awaitable]) -> List[Tuple[str, tuple]]:
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append((statement, parameters))
+
+    event.listen(engine.sync_engine, "before_cursor_execute", record)
+    try:
+        await call()
+    finally:
+        event.remove(engine.sync_engine, "before_cursor_execute", record)
+    return statements
+
+
+async def check(name: str, call, table: str, index: str, no_seqscan: bool) -> bool:
+    statements = await capture(call)
+    found = []
+    async with engine.connect() as conn:
+        # On a partitioned table each partition has its own copy of the index
+        tree = "SELECT relid::regclass::text FROM pg_partition_tree($1)"
+        tables = {table, *(await conn.exec_driver_sql(tree, (table,))).scalars()}
+        indexes = {index, *(await conn.exec_driver_sql(tree, (index,))).scalars()}
+        if no_seqscan:
+            await conn.exec_driver_sql("SET enable_seqscan = off")
+        for statement, parameters in statements:
+            result = await conn.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {statement}", parameters)
+            plan = result.scalar()
+            found += scans((json.loads(plan) if isinstance(plan, str) else plan)[0]["Plan"])
+    used = any(scan_index in indexes for _, _, scan_index in found)
+    seq = any(node == "Seq Scan" and relation in tables for node, relation, _ in found)
+    ok = used and not seq
+    detail = ", ".join(f"{node} {relation or '?'}{' using ' + idx if idx else ''}" for node, relation, idx in found)
+    print(f"{'ok  ' if ok else 'FAIL'} {name:<36} {detail}")
+    return ok
+
+
+async def main(args):
+    try:
+        failed = [
+            name for name, (call, table, index) in CASES.items()
+            if not await check(name, call, table, index, args.no_seqscan)
+        ]
+    finally:
+        await engine.dispose()
+    if failed:
+        print(f"{len(failed)} of {len(CASES)} queries missed their index")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--no-seqscan", action="store_true", help="SET enable_seqscan = off (small databases)")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,234 @@
+"""Drive the API with concurrent clients and record latency per endpoint.
+
+    python -m bench.seed                      # once, against the PG_* database
+    python -m bench.load --duration 20 --concurrency 32
+
+By default this starts the mock Bilibili server and the API under uvicorn,
+pointing BILIBILI_API_BASE at the mock; pass --base-url to load an already
+running API instead. Each scenario runs for --duration seconds, one after
+another. Results (throughput, p50/p90/p99 latency, errors) are printed and
+written to bench/results/<commit>-<timestamp>.json; compare two runs with
+`python -m bench.compare old.json new.json`.
+"""
+from datetime import datetime, timezone
+from typing import Awaitable, Callable, Dict
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+
+import httpx
+
+from .seed import FIRST_AID
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+
+
+class Context:
+    """What scenarios need to know about the seeded data."""
+
+    def __init__(self, videos: int, tracked: int, batch: int):
+        self.videos = videos
+        self.tracked = tracked
+        self.batch = batch
+        # New aids for ingest scenarios, clear of the seeded range
+        self.new_aids = itertools.count(FIRST_AID + videos + random.randrange(10**6) * 1000)
+        # Seconds over the last day; a random fraction keeps rows clear of the
+        # whole-minute seed data and of earlier runs
+        self.seconds = itertools.count(int(time.time()) - 86400)
+
+    def seeded_aid(self) -> int:
+        return FIRST_AID + random.randrange(self.videos)
+
+    def tracked_aid(self) -> int:
+        return FIRST_AID + random.randrange(self.tracked)
+
+    def minute_rows(self) -> list:
+        minute = next(self.seconds) + random.random()
+        rows = []
+        for aid in random.sample(range(FIRST_AID, FIRST_AID + self.tracked), min(self.batch, self.tracked)):
+            view = random.randrange(10**6)
+            rows.append({
+                "time": minute, "aid": aid, "coin": view // 50, "favorite": view // 20,
+                "danmaku": view // 100, "view": view, "reply": view // 200, "share": view // 300,
+                "like": view // 10,
+            })
+        return rows
+
+
+async def priority_page(client: httpx.AsyncClient, ctx: Context):
+    return await client.get(
+        "/get_video_static_by_priority", params={"cursor": ctx.seeded_aid(), "limit": 1000}
+    )
+
+
+async def video_detail(client: httpx.AsyncClient, ctx: Context):
+    return await client.get("/get_video_detail", params={"aids": [ctx.seeded_aid() for _ in range(50)]})
+
+
+async def minute_series(client: httpx.AsyncClient, ctx: Context):
+    return await client.get(
+        "/get_video_minute_series",
+        params={"aids": [ctx.tracked_aid() for _ in range(10)], "bucket": "1h"},
+    )
+
+
+async def minute_bulk(client: httpx.AsyncClient, ctx: Context):
+    return await client.post("/add_video_minute_bulk", json=ctx.minute_rows())
+
+
+async def add_video_static(client: httpx.AsyncClient, ctx: Context):
+    # Unknown aid: goes through WBI signing and the (mock) upstream
+    return await client.get("/add_video_static", params={"avid": next(ctx.new_aids)})
+
+
+async def crud_add_records(client: httpx.AsyncClient, ctx: Context):
+    # In-process, without HTTP: the ORM insert path itself
+    from app import crud, models, schemas
+
+    await crud.add_records(models.VideoMinute, [schemas.VideoMinuteCreate(**row) for row in ctx.minute_rows()])
+
+
+SCENARIOS: Dict[str, Callable[[httpx.AsyncClient, Context], Awaitable]] = {
+    "priority_page": priority_page,
+    "video_detail": video_detail,
+    "minute_series": minute_series,
+    "minute_bulk": minute_bulk,
+    "add_video_static": add_video_static,
+    "crud.add_records": crud_add_records,
+}
+
+
+def percentile(samples: list, q: float) -> float:
+    return samples[min(len(samples) - 1, int(len(samples) * q))] if samples else 0.0
+
+
+async def run_scenario(name: str, base_url: str, ctx: Context, concurrency: int, duration: float) -> dict:
+    scenario = SCENARIOS[name]
+    samples = []
+    errors: Dict[str, int] = {}
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+        deadline = time.perf_counter() + duration
+
+        async def worker():
+            while time.perf_counter() < deadline:
+                start = time.perf_counter()
+                try:
+                    response = await scenario(client, ctx)
+                    error = f"HTTP {response.status_code}" if response is not None and response.is_error else None
+                except Exception as e:
+                    error = type(e).__name__
+                samples.append((time.perf_counter() - start) * 1000)
+                if error:
+                    errors[error] = errors.get(error, 0) + 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*[worker() for _ in range(concurrency)])
+        elapsed = time.perf_counter() - started
+
+    samples.sort()
+    return {
+        "requests": len(samples),
+        "errors": errors,
+        "rps": round(len(samples) / elapsed, 2),
+        "p50_ms": round(percentile(samples, 0.50), 3),
+        "p90_ms": round(percentile(samples, 0.90), 3),
+        "p99_ms": round(percentile(samples, 0.99), 3),
+        "max_ms": round(samples[-1], 3) if samples else 0.0,
+    }
+
+
+def start_server(module: str, port: int, env: dict, logs: bool = False) -> subprocess.Popen:
+    output = None if logs else subprocess.DEVNULL
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", module, "--port", str(port), "--log-level", "warning"],
+        env=env,
+        stdout=output,
+        stderr=output,
+    )
+
+
+async def wait_ready(url: str, timeout: float = 30):
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while True:
+            try:
+                (await client.get(url)).raise_for_status()
+                return
+            except httpx.HTTPError:
+                if time.monotonic() > deadline:
+                    raise
+                await asyncio.sleep(0.2)
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+async def main(args):
+    ctx = Context(args.videos, args.tracked, args.batch)
+    servers = []
+    base_url = args.base_url
+    try:
+        if base_url is None:
+            mock_url = f"http://127.0.0.1:{args.mock_port}"
+            servers.append(start_server("bench.mock_bilibili:app", args.mock_port, {**os.environ, "MOCK_DELAY": str(args.mock_delay)}))
+            await wait_ready(f"{mock_url}/calls")
+            env = {**os.environ, "BILIBILI_API_BASE": mock_url, "BILIBILI_RATE": str(args.upstream_rate)}
+            servers.append(start_server("app.main:app", args.port, env, args.server_logs))
+            base_url = f"http://127.0.0.1:{args.port}"
+            await wait_ready(f"{base_url}/")
+
+        results = {}
+        for name in args.scenarios.split(","):
+            results[name] = await run_scenario(name, base_url, ctx, args.concurrency, args.duration)
+            r = results[name]
+            print(
+                f"{name:<18} {r['rps']:>9.1f} req/s  p50 {r['p50_ms']:>8.2f}  p90 {r['p90_ms']:>8.2f}  "
+                f"p99 {r['p99_ms']:>8.2f} ms  errors {sum(r['errors'].values())}"
+            )
+    finally:
+        for server in servers:
+            server.terminate()
+            server.wait()
+
+    report = {
+        "commit": git_commit(),
+        "date": datetime.now(timezone.utc).isoformat(),
+        "config": {key: value for key, value in vars(args).items() if key != "output"},
+        "results": results,
+    }
+    output = args.output or os.path.join(
+        RESULTS_DIR, f"{report['commit']}-{datetime.now().strftime('%Y%m%d%H%M%S')}.json"
+    )
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"saved {output}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help="comma-separated, run in order")
+    parser.add_argument("--duration", type=float, default=20, help="seconds per scenario")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--videos", type=int, default=100000, help="as passed to bench.seed")
+    parser.add_argument("--tracked", type=int, default=1000, help="as passed to bench.seed")
+    parser.add_argument("--batch", type=int, default=500, help="rows per minute_bulk request")
+    parser.add_argument("--base-url", help="load this running API instead of starting one")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--mock-port", type=int, default=8766)
+    parser.add_argument("--mock-delay", type=float, default=0.05, help="seconds per mock upstream call")
+    parser.add_argument("--upstream-rate", type=float, default=0, help="BILIBILI_RATE for the API, 0 disables")
+    parser.add_argument("--server-logs", action="store_true", help="show the API's log output")
+    parser.add_argument("--output", help="JSON file to write (default: bench/results/)")
+    asyncio.run(main(parser.parse_args()))
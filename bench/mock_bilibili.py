@@ -0,0 +1,64 @@
+"""Stand-in for the Bilibili endpoints that `wbi` and `biliapi` call.
+
+    uvicorn bench.mock_bilibili:app --port 8099
+
+Every aid gets a deterministic fake video; aids ending in 404 answer with
+code -404. MOCK_DELAY (seconds) simulates upstream latency.
+"""
+from fastapi import FastAPI, Request
+import asyncio
+import os
+
+MOCK_DELAY = float(os.getenv("MOCK_DELAY", "0.05"))
+
+app = FastAPI()
+calls = {"nav": 0, "detail": 0}
+
+
+@app.get("/x/web-interface/nav")
+async def nav():
+    calls["nav"] += 1
+    # Logged-out answer: code -101, but the WBI key images are still present
+    return {
+        "code": -101,
+        "message": "账号未登录",
+        "data": {
+            "wbi_img": {
+                "img_url": "https://i0.hdslb.com/bfs/wbi/7cd084941338484aae1ad9425b84077c.png",
+                "sub_url": "https://i0.hdslb.com/bfs/wbi/4932caff0ff746eab6f01bf08b70ac45.png",
+            }
+        },
+    }
+
+
+@app.get("/x/web-interface/wbi/view/detail")
+async def detail(request: Request):
+    calls["detail"] += 1
+    if MOCK_DELAY:
+        await asyncio.sleep(MOCK_DELAY)
+    params = request.query_params
+    aid = int(params.get("aid") or 0) or 1000
+    if aid % 1000 == 404:
+        return {"code": -404, "message": "啥都木有", "ttl": 1}
+    return {
+        "code": 0,
+        "message": "0",
+        "data": {
+            "View": {
+                "aid": aid,
+                "bvid": params.get("bvid") or f"BV1mock{aid}",
+                "pubdate": 1700000000 + aid % 10000000,
+                "title": f"【初音ミク】mock {aid}",
+                "desc": "mock description",
+                "pic": f"http://i0.hdslb.com/bfs/archive/{aid}.jpg",
+                "tid": 30,
+                "owner": {"mid": 10000 + aid % 500},
+            },
+            "Tags": [{"tag_name": "VOCALOID"}, {"tag_name": "初音ミク"}],
+        },
+    }
+
+
+@app.get("/calls")
+def get_calls():
+    return calls
@@ -0,0 +1,88 @@
+"""Fill the configured Postgres (PG_* env) with benchmark data.
+
+    python -m bench.seed --videos 100000 --tracked 1000 --days 7 --interval 5
+
+Creates the tables if needed, then inserts `videos` video_static rows (aid
+1000 upwards, every tenth one with a priority) and, for the first `tracked`
+of them, one video_minute row every `interval` minutes over the last `days`
+days with steadily growing counters. The defaults give about 2M minute rows.
+Rows are generated server-side with generate_series; existing keys are kept.
+"""
+from datetime import datetime, timedelta, timezone
+import argparse
+import asyncio
+import time
+
+from app import models
+from app.database import Base, engine
+from app.partitions import minute_partitions
+
+FIRST_AID = 1000
+
+
+async def seed(videos: int, tracked: int, days: int, interval: int, chunk: int = 100, reset: bool = False):
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        if reset:
+            await conn.exec_driver_sql("TRUNCATE video_static, video_minute")
+
+    start = time.perf_counter()
+    async with engine.begin() as conn:
+        await conn.exec_driver_sql(
+            """
+            INSERT INTO video_static (aid, bvid, pubdate, title, description, tag, pic, type_id, user_id, priority)
+            SELECT aid, 'BV1seed' || aid, now() - aid * interval '1 minute',
+                   '【初音ミク】seed ' || aid, repeat('description ', 8), 'VOCALOID;初音ミク',
+                   '//i0.hdslb.com/bfs/archive/' || aid || '.jpg', 30, 10000 + aid % 500,
+                   CASE WHEN aid % 10 = 0 THEN 1 + aid % 3 END
+            FROM generate_series($1::bigint, $2::bigint) AS aid
+            ON CONFLICT DO NOTHING
+            """,
+            (FIRST_AID, FIRST_AID + videos - 1),
+        )
+    print(f"video_static: {videos} rows in {time.perf_counter() - start:.1f}s")
+
+    end = datetime.now(timezone.utc).replace(second=0, microsecond=0)
+    samples = days * 1440 // interval
+    if samples:
+        await minute_partitions.ensure([end - timedelta(minutes=n * interval) for n in range(samples)])
+    start = time.perf_counter()
+    for first in range(FIRST_AID, FIRST_AID + tracked, chunk):
+        last = min(first + chunk, FIRST_AID + tracked) - 1
+        # One transaction per chunk of aids keeps WAL and lock footprint bounded
+        async with engine.begin() as conn:
+            await conn.exec_driver_sql(
+                """
+                INSERT INTO video_minute (time, aid, coin, favorite, danmaku, view, reply, share, "like")
+                SELECT $1::timestamptz - n * $2::int * interval '1 minute', aid,
+                       v / 50, v / 20, v / 100, v * (1 + aid % 7)::int, v / 200, v / 300, v / 10
+                FROM generate_series($3::bigint, $4::bigint) AS aid
+                CROSS JOIN generate_series(0, $5::int - 1) AS n
+                CROSS JOIN LATERAL (SELECT $5::int + (aid % 1000)::int * 10 - n AS v) AS growth
+                ON CONFLICT DO NOTHING
+                """,
+                (end, interval, first, last, samples),
+            )
+        done = last - FIRST_AID + 1
+        print(f"video_minute: {done * samples} rows ({done}/{tracked} aids)", end="\r", flush=True)
+    print(f"\nvideo_minute: {tracked * samples} rows in {time.perf_counter() - start:.1f}s")
+
+    async with engine.begin() as conn:
+        await conn.exec_driver_sql(f"ANALYZE {models.VideoStatic.__tablename__}")
+        await conn.exec_driver_sql(f"ANALYZE {models.VideoMinute.__tablename__}")
+    await engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--videos", type=int, default=100000)
+    parser.add_argument("--tracked", type=int, default=1000, help="videos that get minute data")
+    parser.add_argument("--days", type=int, default=7)
+    parser.add_argument("--interval", type=int, default=5, help="minutes between samples")
+    parser.add_argument("--reset", action="store_true", help="truncate video_static and video_minute first")
+    args = parser.parse_args()
+    asyncio.run(seed(args.videos, args.tracked, args.days, args.interval, reset=args.reset))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,16 @@
+-- no-transaction
+-- Indexes for the hot crud lookups, built without blocking writes.
+-- A failed concurrent build leaves an INVALID index that IF NOT EXISTS
+-- skips: drop it and rerun.
+
+-- get_identifier_map(s), /resolve_identifiers
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_identifier_map_identifier
+    ON identifier_map (identifier);
+
+-- get_video_static_by_priority: keyset pages on aid over rows with a priority
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_video_static_priority
+    ON video_static (aid, priority) WHERE priority IS NOT NULL;
+
+-- get_video_minute, get_video_minute_series: the primary key leads with time
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_video_minute_aid_time
+    ON video_minute (aid, time DESC);
@@ -0,0 +1,97 @@
+-- no-transaction
+-- Turn video_minute into a table range-partitioned on time, and add
+-- video_minute_hourly for compacted history (app/partitions.py).
+--
+-- Existing rows stay where they are: the old table becomes one partition,
+-- video_minute_legacy, covering everything up to a cutover two days ahead.
+-- The app creates day or week partitions from there on. The bound check is
+-- added NOT VALID and validated separately so writes continue while it
+-- scans; only the final swap takes a short exclusive lock.
+
+DO $$
+DECLARE
+    cutover timestamptz;
+BEGIN
+    IF (SELECT relkind FROM pg_class WHERE oid = to_regclass('video_minute')) = 'r'
+        AND NOT EXISTS (SELECT FROM pg_constraint WHERE conname = 'video_minute_partition_bound') THEN
+        SELECT date_trunc('day', greatest(max(time), now()), 'UTC') + interval '2 days'
+        INTO cutover FROM video_minute;
+        EXECUTE format(
+            'ALTER TABLE video_minute ADD CONSTRAINT video_minute_partition_bound CHECK (time < %L) NOT VALID',
+            cutover
+        );
+    END IF;
+END $$;
+
+DO $$
+BEGIN
+    IF EXISTS (SELECT FROM pg_constraint WHERE conname = 'video_minute_partition_bound' AND NOT convalidated) THEN
+        ALTER TABLE video_minute VALIDATE CONSTRAINT video_minute_partition_bound;
+    END IF;
+END $$;
+
+DO $$
+DECLARE
+    kind "char";
+    cutover timestamptz;
+BEGIN
+    SELECT relkind INTO kind FROM pg_class WHERE oid = to_regclass('video_minute');
+    IF kind = 'p' THEN
+        RETURN;
+    END IF;
+    IF kind IS NOT NULL THEN
+        SELECT substring(pg_get_constraintdef(oid) FROM '''([^'']+)''')::timestamptz INTO cutover
+        FROM pg_constraint WHERE conname = 'video_minute_partition_bound';
+        ALTER TABLE video_minute RENAME TO video_minute_legacy;
+        ALTER INDEX IF EXISTS video_minute_pkey RENAME TO video_minute_legacy_pkey;
+        ALTER INDEX IF EXISTS ix_video_minute_aid_time RENAME TO video_minute_legacy_aid_time_idx;
+    END IF;
+
+    CREATE TABLE video_minute (
+        time timestamptz NOT NULL,
+        aid bigint NOT NULL,
+        coin integer,
+        favorite integer,
+        danmaku integer,
+        view integer,
+        reply integer,
+        share integer,
+        "like" integer,
+        CONSTRAINT video_minute_pkey PRIMARY KEY (time, aid)
+    ) PARTITION BY RANGE (time);
+    CREATE INDEX ix_video_minute_aid_time ON video_minute (aid, time DESC);
+    COMMENT ON COLUMN video_minute.time IS '记录时间戳';
+    COMMENT ON COLUMN video_minute.aid IS '视频的 AV 号';
+    COMMENT ON COLUMN video_minute.coin IS '硬币';
+    COMMENT ON COLUMN video_minute.favorite IS '收藏';
+    COMMENT ON COLUMN video_minute.danmaku IS '弹幕';
+    COMMENT ON COLUMN video_minute.view IS '播放';
+    COMMENT ON COLUMN video_minute.reply IS '评论';
+    COMMENT ON COLUMN video_minute.share IS '分享';
+    COMMENT ON COLUMN video_minute."like" IS '点赞';
+
+    IF kind IS NOT NULL THEN
+        -- The validated check proves the bound, so attaching skips the scan
+        -- and reuses the matching indexes
+        EXECUTE format(
+            'ALTER TABLE video_minute ATTACH PARTITION video_minute_legacy FOR VALUES FROM (MINVALUE) TO (%L)',
+            cutover
+        );
+        ALTER TABLE video_minute_legacy DROP CONSTRAINT video_minute_partition_bound;
+    END IF;
+END $$;
+
+CREATE TABLE IF NOT EXISTS video_minute_hourly (
+    time timestamptz NOT NULL,
+    aid bigint NOT NULL,
+    coin integer,
+    favorite integer,
+    danmaku integer,
+    view integer,
+    reply integer,
+    share integer,
+    "like" integer,
+    PRIMARY KEY (time, aid)
+);
+
+CREATE INDEX IF NOT EXISTS ix_video_minute_hourly_aid_time ON video_minute_hourly (aid, time DESC);
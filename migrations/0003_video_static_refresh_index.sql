@@ -0,0 +1,6 @@
+-- no-transaction
+-- Index in the order app/refresh.py picks stale video_static rows:
+-- priority first (rows without one last), then the oldest updated_at.
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_video_static_refresh
+    ON video_static (priority ASC NULLS LAST, updated_at ASC NULLS FIRST, aid);
@@ -0,0 +1,9 @@
+-- Progress of incremental jobs (app/rollup.py): one row per job name.
+
+CREATE TABLE IF NOT EXISTS etl_watermark (
+    name varchar(64) PRIMARY KEY,
+    value timestamptz NOT NULL
+);
+
+COMMENT ON COLUMN etl_watermark.name IS '任务名';
+COMMENT ON COLUMN etl_watermark.value IS '已处理到的时间';
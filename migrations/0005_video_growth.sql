@@ -0,0 +1,29 @@
+-- Growth per aid and window written by the leaderboard
+-- (LEADERBOARD_PERSIST_INTERVAL, app/leaderboard.py).
+
+CREATE TABLE IF NOT EXISTS video_growth (
+    aid bigint NOT NULL,
+    span varchar(16) NOT NULL,
+    time timestamptz NOT NULL,
+    since timestamptz NOT NULL,
+    coin integer,
+    favorite integer,
+    danmaku integer,
+    view integer,
+    reply integer,
+    share integer,
+    "like" integer,
+    PRIMARY KEY (aid, span)
+);
+
+COMMENT ON COLUMN video_growth.aid IS '视频的 AV 号';
+COMMENT ON COLUMN video_growth.span IS '统计窗口, 如 1h / 1d';
+COMMENT ON COLUMN video_growth.time IS '最新记录时间';
+COMMENT ON COLUMN video_growth.since IS '窗口起点的记录时间';
+COMMENT ON COLUMN video_growth.coin IS '硬币增量';
+COMMENT ON COLUMN video_growth.favorite IS '收藏增量';
+COMMENT ON COLUMN video_growth.danmaku IS '弹幕增量';
+COMMENT ON COLUMN video_growth.view IS '播放增量';
+COMMENT ON COLUMN video_growth.reply IS '评论增量';
+COMMENT ON COLUMN video_growth.share IS '分享增量';
+COMMENT ON COLUMN video_growth."like" IS '点赞增量';